@@ -1,7 +1,29 @@
 from PIL import Image, ImageDraw
-from sympy.utilities.iterables import multiset_permutations
-import copy
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations, islice, product
+import multiprocessing
 import time
+import tracemalloc
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# The blocks in the order of their codes in the boards traced in batches
+BLOCK_CODES = ['o', 'A', 'B', 'C']
+
+# The orders find_path can search in
+ORDERS = ['lex', 'gray', 'combination', 'surplus', 'jump', 'bitboard', 'batch']
+
+
+class UnsolvableLevel(Exception):
+    '''
+    The error raised for a level no arrangement of its blocks can solve
+    '''
 
 
 def read_bff(file_name):
@@ -272,6 +294,12 @@ class Grid(object):
     '''
     This Function class is a wrapper for generating various grids  
 
+    A search keeps one Grid over a copy of the level as its working board.
+    The open cells are worked out once, a new grid only writes the cells
+    whose block changes, and apply keeps what a cell held in an undo log so
+    revert can take the blocks back out again. So the grid the level came
+    in is never changed.
+
     **Parameters**
 
         grid : *list*
@@ -282,6 +310,32 @@ class Grid(object):
         self.origrid = origrid
         self.length = len(origrid)
         self.width = len(origrid[0])
+        # The open cells, found on the first call of open_cells
+        self.cells = None
+        self.log = []
+
+    def open_cells(self, position):
+        '''
+        This function finds the cells gen_grid puts blocks into, they are
+        only searched for the first time, a Grid is used with one set of
+        fixed blocks
+
+        **Parameters**
+
+            position: *list*
+                The coordination of the fixed blocks
+
+        **Return**
+
+            cells: *list*
+                The (x, y) coordinations of the cells, in the order they are filled
+        '''
+        if self.cells is None:
+            fixed = set(tuple(block) for block in position)
+            self.cells = tuple(
+                (column, row) for row in range(self.length) for column in range(self.width)
+                if (row, column) not in fixed and self.origrid[row][column] != 'x')
+        return list(self.cells)
 
     def gen_grid(self, listgrid, position):
         '''
@@ -300,12 +354,61 @@ class Grid(object):
                 The grid with blocks filled in
         '''
         self.listgrid = listgrid
-        for row in range(len(self.origrid)):
-            for column in range(len(self.origrid[0])):
-                if [row, column] not in position:
-                    if self.origrid[row][column] != 'x':
-                        self.origrid[row][column] = listgrid.pop(0)
-        return self.origrid
+        board = self.origrid
+        if self.cells is None:
+            self.open_cells(position)
+        for (x, y), block in zip(self.cells, listgrid):
+            if board[y][x] != block:
+                board[y][x] = block
+        return board
+
+    def apply(self, cells, blocks):
+        '''
+        This function puts blocks into some cells of the grid and keeps what
+        the cells held before in the undo log
+
+        **Parameters**
+
+            cells: *list*
+                The (x, y) coordinations of the cells
+            blocks: *list*
+                The block put into each of the cells
+
+        **Return**
+
+            mark: *int*
+                The length of the undo log before the blocks were put in,
+                revert takes the grid back to here
+        '''
+        log = self.log
+        mark = len(log)
+        board = self.origrid
+        for (x, y), block in zip(cells, blocks):
+            row = board[y]
+            if row[x] != block:
+                log.append((x, y, row[x]))
+                row[x] = block
+        return mark
+
+    def revert(self, mark=0):
+        '''
+        This function takes back the blocks put in by apply, latest first
+
+        **Parameters**
+
+            mark: *int*
+                The length of the undo log to go back to
+
+        **Return**
+
+            self.origrid: *list*
+                The grid with the blocks taken back out
+        '''
+        board = self.origrid
+        for x, y, block in reversed(self.log[mark:]):
+            board[y][x] = block
+        del self.log[mark:]
+        return board
 
 
 class Lazor(object):
@@ -320,12 +423,29 @@ class Lazor(object):
             A list of list stand for start point and direction of lazor 
         holelist : *list*
             A list of list stand for the position of the end point or the hole 
+        table : *TransitionTable*
+            The transitions of the level, the lazors are moved by looking
+            them up instead of through meet_block when it is given
+        lines : *LineIndex*
+            The lines of the level with the blocks of grid in them, the
+            lazors jump from block to block along them when it is given
     '''
 
-    def __init__(self, grid, lazorlist, holelist):
+    def __init__(self, grid, lazorlist, holelist, table=None, lines=None):
         self.grid = grid
         self.lazorlist = lazorlist
         self.holelist = holelist
+        # The TransitionTable of the level, if there is one
+        self.table = table
+        self.lines = lines
+        # A BitBoard is read cell by cell instead of row by row
+        self.bits = isinstance(grid, BitBoard)
+        if self.bits:
+            self.length = grid.length
+            self.width = grid.width
+        else:
+            self.length = len(grid)
+            self.width = len(grid[0])
 
     def block(self, block_type):
         '''
@@ -404,10 +524,16 @@ class Lazor(object):
         x2, y2 = point[0] + direction[0], point[1]
         # Obtain the block laser touches
         if point[0] & 1 == 1:
-            block_type = self.grid[y1][x1]
+            if self.bits:
+                block_type = self.grid.cell(x1, y1)
+            else:
+                block_type = self.grid[y1][x1]
             new_direction = self.block(block_type)
         if point[0] & 1 == 0:
-            block_type = self.grid[y2][x2]
+            if self.bits:
+                block_type = self.grid.cell(x2, y2)
+            else:
+                block_type = self.grid[y2][x2]
             new_direction = self.block(block_type)
 
         return new_direction
@@ -428,8 +554,8 @@ class Lazor(object):
             *bool*
                 True if the lazor is still in the grid
         '''
-        width = len(self.grid[0])
-        length = len(self.grid)
+        width = self.width
+        length = self.length
         x = laz_co[0]
         y = laz_co[1]
         # Determine whether the position is in the grid
@@ -442,210 +568,3374 @@ class Lazor(object):
         else:
             return False
 
-    def lazor_path(self):
+    def step(self, lazorlist, k, result):
         '''
-        This function can return a list of the lasors path
+        This function moves the k-th lazor in the lazor list one step forward
+
+        **Parameters**
+
+            lazorlist: *list*
+                A list contains lasors path, new lazors are added to it
+            k: *int*
+                The index of the lazor to move
+            result: *list*
+                The holes the lazors have passed, new holes are added to it
+
+        **Return**
+
+            *bool*
+                False if the lazor has left the grid or been absorbed
+        '''
+        if self.lines is not None:
+            moved = self.jump(lazorlist, k, result)
+            if moved is not None:
+                return moved
+        if self.table is not None:
+            return self.table_step(lazorlist, k, result)
+        return self.list_step(lazorlist, k, result)
+
+    def list_step(self, lazorlist, k, result):
+        '''
+        This function does the same as step, finding the new position and
+        direction of the lazor with meet_block
+
+        **Parameters**
+
+            The same parameters as step
+
+        **Return**
+
+            *bool*
+                False if the lazor has left the grid or been absorbed
+        '''
+        coordination_x = lazorlist[k][-1][0]
+        coordination_y = lazorlist[k][-1][1]
+        direction_x = lazorlist[k][-1][2]
+        direction_y = lazorlist[k][-1][3]
+        coordination = [coordination_x, coordination_y]
+        direction = [direction_x, direction_y]
+        # Checking if the lazor and its next step is inside the boundary
+        if self.check(coordination, direction):
+            return False
+        # Receiving the coordination & direction of lazor after a step
+        next_step = self.meet_block(coordination, direction)
+        # If there are no elements in the list, it indicates it is block B
+        if len(next_step) == 0:
+            lazorlist[k].append([
+                coordination[0], coordination[1], 0, 0])
+            if (coordination in self.holelist) and (coordination not in result):
+                result.append(coordination)
+            return False
+        # If there are 2 elements, it is "o" or A block
+        elif len(next_step) == 2:
+            direction = next_step
+            coordination = [
+                coordination[0] + direction[0], coordination[1] + direction[1]]
+            lazorlist[k].append(
+                [coordination[0], coordination[1], direction[0], direction[1]])
+            if (coordination in self.holelist) and (coordination not in result):
+                result.append(coordination)
+        # If there are 4 elements, it is C block or D block, we seperate them and add the straight line to a new list in lazor list,
+        # and the other to the list under the original lazor
+        elif len(next_step) == 4:
+            if next_step[0] == 0 or next_step[0] == 2:
+                direction = next_step
+                coordination = [
+                    coordination[0] + direction[0], coordination[1] + direction[1]]
+                lazorlist[k].append(
+                    [coordination[0], coordination[1], direction[2], direction[3]])
+                if (coordination in self.holelist) and (coordination not in result):
+                    result.append(coordination)
+            else:
+                direction = next_step
+                coordination_newlaz1 = [
+                    coordination[0] + direction[0], coordination[1] + direction[1]]
+                coordination_newlaz2 = [
+                    coordination[0], coordination[1]]
+                lazorlist.append(
+                    [[coordination_newlaz1[0], coordination_newlaz1[1], direction[0], direction[1]]])
+                lazorlist[k].append(
+                    [coordination_newlaz2[0], coordination_newlaz2[1], direction[2], direction[3]])
+                coordination = coordination_newlaz2
+                if (coordination in self.holelist) and (coordination not in result):
+                    result.append(coordination)
+                # The lazor passing through the block also reaches a new point
+                if (coordination_newlaz1 in self.holelist) and (coordination_newlaz1 not in result):
+                    result.append(coordination_newlaz1)
+        else:
+            print('Wrong')
+        return True
+
+    def table_step(self, lazorlist, k, result):
+        '''
+        This function does the same as step, looking the new position and
+        direction of the lazor up in the TransitionTable
+
+        **Parameters**
+
+            The same parameters as step
+
+        **Return**
+
+            *bool*
+                False if the lazor has left the grid or been absorbed
+        '''
+        table = self.table
+        x, y, dx, dy = lazorlist[k][-1]
+        state = table.state(x, y, dx, dy)
+        cell_x = table.cell_x[state]
+        if cell_x < 0:
+            return False
+        if self.bits:
+            block_type = self.grid.cell(cell_x, table.cell_y[state])
+        else:
+            block_type = self.grid[table.cell_y[state]][cell_x]
+        if block_type == 'B':
+            lazorlist[k].append([x, y, 0, 0])
+            self.table_hole(state, result)
+            return False
+        if block_type == 'A':
+            state = table.bounce[state]
+        elif block_type == 'C':
+            child = table.step[state]
+            lazorlist.append([list(table.entries[child])])
+            state = table.turn[state]
+            lazorlist[k].append(list(table.entries[state]))
+            self.table_hole(state, result)
+            self.table_hole(child, result)
+            return True
+        elif block_type == 'D':
+            return self.list_step(lazorlist, k, result)
+        else:
+            state = table.step[state]
+        lazorlist[k].append(list(table.entries[state]))
+        self.table_hole(state, result)
+        return True
+
+    def jump(self, lazorlist, k, result):
+        '''
+        This function moves the k-th lazor in the lazor list straight to the
+        next point it meets a block at, or to the edge of the grid, passing
+        the holes on the way
+
+        **Parameters**
+
+            The same parameters as step
+
+        **Return**
+
+            *bool*
+                False if the lazor has left the grid, None if it already
+                meets a block and has to take a step
+        '''
+        x, y, dx, dy = lazorlist[k][-1]
+        stop = self.lines.next_block(x, y, dx, dy)
+        if stop is not None and stop[0] == x:
+            return None
+        for hole in self.lines.holes_between(x, y, dx, dy, stop):
+            if list(hole) not in result:
+                result.append(list(hole))
+        if stop is not None:
+            lazorlist[k].append([stop[0], stop[1], dx, dy])
+            return True
+        # The last point before the edge
+        steps = min(self.width - 1 - x if dx > 0 else x, self.length - 1 - y if dy > 0 else y)
+        if steps > 0:
+            lazorlist[k].append([x + steps * dx, y + steps * dy, dx, dy])
+        return False
+
+    def table_solve(self):
+        '''
+        This function does the same as lazor_path in solve mode with the
+        TransitionTable. The lazors are kept as the ints of their states and
+        the holes passed as the bits of an int, so no path is built
 
         **Parameters**
 
             None
 
+        **Return**
+
+            *bool*
+                True if the lazors pass every hole, None if they meet a 'D'
+                block, which only step follows
+        '''
+        table = self.table
+        grid = self.grid
+        goal = (1 << len(self.holelist)) - 1
+        covered = 0
+        table.traces += 1
+        number = table.traces
+        seen = table.seen
+        stack = [table.state(*lazor) for lazor in self.lazorlist]
+        while stack:
+            state = stack.pop()
+            while seen[state] != number:
+                if covered == goal:
+                    return True
+                seen[state] = number
+                cell_x = table.cell_x[state]
+                if cell_x < 0:
+                    break
+                if self.bits:
+                    block_type = grid.cell(cell_x, table.cell_y[state])
+                else:
+                    block_type = grid[table.cell_y[state]][cell_x]
+                if block_type == 'B':
+                    if table.hole[state] >= 0:
+                        covered |= 1 << table.hole[state]
+                    break
+                if block_type == 'A':
+                    state = table.bounce[state]
+                elif block_type == 'C':
+                    child = table.step[state]
+                    if table.hole[child] >= 0:
+                        covered |= 1 << table.hole[child]
+                    stack.append(child)
+                    state = table.turn[state]
+                elif block_type == 'D':
+                    return None
+                else:
+                    state = table.step[state]
+                if table.hole[state] >= 0:
+                    covered |= 1 << table.hole[state]
+        return covered == goal
+
+    def table_hole(self, state, result):
+        '''
+        This function adds the hole at the position of a state of the
+        TransitionTable to result
+        '''
+        hole = self.table.hole[state]
+        if hole >= 0 and self.holelist[hole] not in result:
+            result.append(list(self.holelist[hole]))
+
+    def propagate(self, lazorlist, result, visited, k, stop=False):
+        '''
+        This function follows the lazors in the lazor list one by one from the
+        k-th one on. A lazor is followed until it leaves the grid, is absorbed,
+        or comes back to a position and direction some lazor has already been
+        in, since from there on it would only repeat a path already traced.
+        For the same reason a lazor split off by a 'C' block is dropped when it
+        starts at a position and direction some lazor has already been in, so
+        the lazors never grow beyond the states of the grid.
+
+        **Parameters**
+
+            lazorlist: *list*
+                A list contains lasors path, new lazors are added to it
+            result: *list*
+                The holes the lazors have passed, new holes are added to it
+            visited: *dict*
+                The positions and directions the lazors have been in, with
+                the order they were reached in
+            k: *int*
+                The index of the first lazor to follow
+            stop: *bool*
+                Stop as soon as all the holes are passed
+
+        **Return**
+
+            k: *int*
+                The index of the lazor it stopped at, which is the number of
+                lazors if every lazor has been followed to its end
+        '''
+        while k < len(lazorlist):
+            state = tuple(lazorlist[k][-1])
+            while state not in visited:
+                if stop and len(result) == len(self.holelist):
+                    return k
+                visited[state] = len(visited)
+                beams = len(lazorlist)
+                moved = self.step(lazorlist, k, result)
+                if len(lazorlist) > beams and tuple(lazorlist[-1][0]) in visited:
+                    lazorlist.pop()
+                if not moved:
+                    break
+                state = tuple(lazorlist[k][-1])
+            k += 1
+        return k
+
+    def lazor_path(self, solve=False):
+        '''
+        This function can return a list of the lasors path
+
+        **Parameters**
+
+            solve: *bool*
+                Only tell whether the grid is right, stopping as soon as the
+                last hole is passed or every lazor has ended
+
         **Return**
 
             lazorlist: *list*
-                A list contains lasors path
+                A list contains lasors path, or a bool in solve mode
         '''
+        if solve and self.table is not None and self.lines is None:
+            solved = self.table_solve()
+            if solved is not None:
+                return solved
         result = []
         lazorlist = []
         # Get the lasers' list from input and store them into lazorlist
         for p in range(len(self.lazorlist)):
             lazorlist.append([self.lazorlist[p]])
-        # IMPORTANT!!!
-        # 'n' here is to avoid infinite loop of laser in a circle
-        # The range can be bigger, but the bigger it is, the slower the script runs
-        # It cannot be too small because of the limitations of some levels
-        for n in range(30):
-            # The original lazor is added to the lazor list
-            for k in range(len(lazorlist)):
-                coordination_x = lazorlist[k][-1][0]
-                coordination_y = lazorlist[k][-1][1]
-                direction_x = lazorlist[k][-1][2]
-                direction_y = lazorlist[k][-1][3]
-                coordination = [coordination_x, coordination_y]
-                direction = [direction_x, direction_y]
-                # Checking if the lazor and its next step is inside the boundary
-                if self.check(coordination, direction):
-                    continue
-                else:
-                    # Receiving the coordination & direction of lazor after a step
-                    next_step = self.meet_block(coordination, direction)
-                    # If there are no elements in the list, it indicates it is block B
-                    if len(next_step) == 0:
-                        lazorlist[k].append([
-                            coordination[0], coordination[1], 0, 0])
-                        if (coordination in self.holelist) and (coordination not in result):
-                            result.append(coordination)
-                    # If there are 2 elements, it is "o" or A block
-                    elif len(next_step) == 2:
-                        direction = next_step
-                        coordination = [
-                            coordination[0] + direction[0], coordination[1] + direction[1]]
-                        lazorlist[k].append(
-                            [coordination[0], coordination[1], direction[0], direction[1]])
-                        if (coordination in self.holelist) and (coordination not in result):
-                            result.append(coordination)
-                    # If there are 4 elements, it is C block or D block, we seperate them and add the straight line to a new list in lazor list,
-                    # and the other to the list under the original lazor
-                    elif len(next_step) == 4:
-                        if next_step[0] == 0 or next_step[0] == 2:
-                            direction = next_step
-                            coordination = [
-                            coordination[0] + direction[0], coordination[1] + direction[1]]
-                            lazorlist[k].append(
-                                [coordination[0], coordination[1], direction[2], direction[3]])
-                            if (coordination in self.holelist) and (coordination not in result):
-                                result.append(coordination)
-                        else:
-                            direction = next_step
-                            coordination_newlaz1 = [
-                                coordination[0] + direction[0], coordination[1] + direction[1]]
-                            coordination_newlaz2 = [
-                                coordination[0], coordination[1]]
-                            lazorlist.append(
-                                [[coordination_newlaz1[0], coordination_newlaz1[1], direction[0], direction[1]]])
-                            lazorlist[k].append(
-                                [coordination_newlaz2[0], coordination_newlaz2[1], direction[2], direction[3]])
-                            coordination = coordination_newlaz2
-                            if (coordination in self.holelist) and (coordination not in result):
-                                result.append(coordination)
-                    else:
-                        print('Wrong')
+        self.propagate(lazorlist, result, {}, 0, stop=solve)
+        if solve:
+            return len(result) == len(self.holelist)
         if len(result) == len(self.holelist):
             return lazorlist
         else:
             return 0
 
 
-def obvs_judge(gridfull_temp, possible_list, list_temp, holelist):
+class TransitionTable(object):
     '''
-    This function can skip some obveriously wrong solution
+    This Function class compiles the moves of the lazors for the size of a
+    level. Every position and direction of a lazor is a state numbered by
+    state(), and for every state the table keeps the cell the lazor meets and
+    the states after it passes the cell, is reflected by it, or is split by
+    it. It is built once for a level and used by every trace of it.
 
     **Parameters**
 
-        gridfull_temp: *list*
-            The grid about to be solved
-
-        possible_list: *list
-            All possible permutations of 'ABCo'.
-
-        list_temp: *list*
-            The permutation currently being used.
-
+        length: *int*
+            The number of rows of the full grid
+        width: *int*
+            The number of columns of the full grid
         holelist: *list*
             The positions of the end points
+    '''
 
-    **Return**
+    def __init__(self, length, width, holelist):
+        self.length = length
+        self.width = width
+        # The points one step outside the grid have states too, since a lazor
+        # reflected at the edge ends there
+        self.span = width + 2
+        size = (length + 2) * self.span * 4
+        self.entries = [None] * size
+        self.hole = [-1] * size
+        # -1 when the lazor or its next step is out of the grid
+        self.cell_x = [-1] * size
+        self.cell_y = [-1] * size
+        # The state after passing, being reflected by, and turning at the cell
+        self.step = [-1] * size
+        self.bounce = [-1] * size
+        self.turn = [-1] * size
+        # The states met by Lazor.table_solve are stamped with the number of
+        # the trace, so nothing is cleared between traces
+        self.seen = [0] * size
+        self.traces = 0
+        holes = {}
+        for i, hole in enumerate(holelist):
+            holes[(hole[0], hole[1])] = i
+        for y in range(-1, length + 1):
+            for x in range(-1, width + 1):
+                for dx in [-1, 1]:
+                    for dy in [-1, 1]:
+                        state = self.state(x, y, dx, dy)
+                        self.entries[state] = (x, y, dx, dy)
+                        self.hole[state] = holes.get((x, y), -1)
+                        if x < 0 or x > width - 1 or y < 0 or y > length - 1 or \
+                                x + dx < 0 or x + dx > width - 1 or \
+                                y + dy < 0 or y + dy > length - 1:
+                            continue
+                        if x & 1 == 1:
+                            self.cell_x[state], self.cell_y[state] = x, y + dy
+                            new_dx, new_dy = dx, -dy
+                        else:
+                            self.cell_x[state], self.cell_y[state] = x + dx, y
+                            new_dx, new_dy = -dx, dy
+                        self.step[state] = self.state(x + dx, y + dy, dx, dy)
+                        self.bounce[state] = self.state(x + new_dx, y + new_dy, new_dx, new_dy)
+                        self.turn[state] = self.state(x, y, new_dx, new_dy)
 
-        None
-    '''
-    for jj in range(len(holelist)):  # Ruling out grids that have blocks blocking a hole
-        x_hole = holelist[jj][1]
-        y_hole = holelist[jj][0]
-        if ((gridfull_temp[x_hole][y_hole + 1] in ['A', 'B']) and (gridfull_temp[x_hole][y_hole - 1] in ['A', 'B'])) or \
-                ((gridfull_temp[x_hole + 1][y_hole] in ['A', 'B']) and (gridfull_temp[x_hole - 1][y_hole] in ['A', 'B'])):
-            return False
-        else:
-            return True
+    def state(self, x, y, dx, dy):
+        '''
+        This function returns the number of a position and direction
+        '''
+        return ((y + 1) * self.span + x + 1) << 2 | (dx > 0) << 1 | (dy > 0)
 
 
-def find_path(grid, A_num, B_num, C_num, lazorlist, holelist, position):
+class LineIndex(object):
     '''
-    Generate a possible grid with blocks filled in and solves it, if it is the right grid, we return all the necessary parameters of the grid
+    This Function class indexes the diagonal lines of the full grid. A lazor
+    going one way along a line is a ray, and for every ray the index keeps
+    the points where a lazor meets an open cell or a fixed block, and the
+    holes on it, in the order the lazor reaches them. So what a lazor meets
+    from a point on is found with a bisect instead of stepping along. The
+    blocks are kept apart, and place and remove keep them the same as the
+    blocks in the board while a search changes it.
 
     **Parameters**
 
         grid: *list*
-            The full grid in the form of a coordinate system
-        A_num: *int*
-            The number of A-block available
-        B_num: *int*
-            The number of B-block available
-        C_num: *int*
-            The number of C-block available
-        lazorlist: *list*
-            The first two elements is the positon of the start point, the last two elements are the direction.
+            The full grid, the cells holding 'o' are the open cells
         holelist: *list*
-            The positions of the end points   
-        position: *list*
-            A list store the pre-placed blocks
+            The positions of the end points
+    '''
 
-    **Return**
+    def __init__(self, grid, holelist):
+        length = len(grid)
+        width = len(grid[0])
+        # The ray of a point and direction is (dx, dy, y - dx * dy * x), and
+        # the points along it are ordered by x * dx
+        self.stop_keys = {}
+        self.stops = {}
+        self.block_keys = {}
+        self.blocks = {}
+        self.hole_keys = {}
+        self.holes = {}
+        # The jumps looked up so far
+        self.jumps = {}
+        # The lists of blocks of the rays, and the places along them and
+        # points, the cells are met from
+        self.readers = {}
+        found = []
+        for y in range(length):
+            for x in range((y + 1) & 1, width, 2):
+                for dx in [-1, 1]:
+                    for dy in [-1, 1]:
+                        if x + dx < 0 or x + dx > width - 1 or \
+                                y + dy < 0 or y + dy > length - 1:
+                            continue
+                        if x & 1 == 1:
+                            cell = (x, y + dy)
+                        else:
+                            cell = (x + dx, y)
+                        block = grid[cell[1]][cell[0]]
+                        if block != 'x':
+                            found.append((x * dx, (dx, dy, y - dx * dy * x), (x, y, cell, block)))
+        for key, ray, stop in sorted(found):
+            self.stop_keys.setdefault(ray, []).append(key)
+            self.stops.setdefault(ray, []).append(stop)
+            keys = self.block_keys.setdefault(ray, [])
+            blocks = self.blocks.setdefault(ray, [])
+            self.readers.setdefault(stop[2], []).append((keys, blocks, key, stop[:3]))
+            if stop[3] != 'o':
+                keys.append(key)
+                blocks.append(stop)
+        for x, y in sorted((hole[0], hole[1]) for hole in holelist):
+            for dx in [-1, 1]:
+                for dy in [-1, 1]:
+                    ray = (dx, dy, y - dx * dy * x)
+                    self.hole_keys.setdefault(ray, []).append(x * dx)
+                    self.holes.setdefault(ray, []).append((x, y))
+        for ray in self.hole_keys:
+            if ray[0] < 0:
+                self.hole_keys[ray].reverse()
+                self.holes[ray].reverse()
+
+    def next_stop(self, x, y, dx, dy):
+        '''
+        This function finds the first point from (x, y) on where the lazor
+        meets an open cell or a fixed block
 
-        solution: *list*
-            The positions and directions laser passed
-        list_temp_save: *list*
-            One possible permutation of blocks
-        test_board: *list*
-            The full grid in coordination
-    '''
-    Blocks = []
-    # Wxtract the blank positions and replace them with blocks
-    for a in grid:
-        for b in a:
-            if b == 'o':
-                Blocks.append(b)
-    for i in range(A_num):
-        Blocks[i] = 'A'
-    for i in range(A_num, (A_num + B_num)):
-        Blocks[i] = 'B'
-    for i in range((A_num + B_num), (A_num + B_num + C_num)):
-        Blocks[i] = 'C'
-    # Generate a list of permutations of blocks and blank postion
-    list_Blocks = list(multiset_permutations(Blocks))
-
-    while len(list_Blocks) != 0:
-        list_temp = list_Blocks[-1]
-        list_temp_save = copy.deepcopy(list_temp)
-        list_Blocks.pop()
-        # Generate a board from grid function
-        ori_grid = Grid(grid)
-        test_board = ori_grid.gen_grid(list_temp, position)
-        # Test the board with obvs_judge and run it through Lazor to see if it is the right board
-        if obvs_judge(test_board, list_Blocks, list_temp, holelist):
-            lazor = Lazor(test_board, lazorlist, holelist)
-            solution = lazor.lazor_path()
-            # We retunr 0 if the board is wrong and return a list with the path of lazors if its right.
-            if solution != 0:
-                return solution, list_temp_save, test_board
+        **Parameters**
+
+            x, y, dx, dy: *int*
+                The position and direction of the lazor
+
+        **Return**
+
+            stop: *tuple*
+                The position of the point, the cell and the block in it,
+                None if the lazor leaves the grid first
+        '''
+        ray = (dx, dy, y - dx * dy * x)
+        keys = self.stop_keys.get(ray)
+        if keys is None:
+            return None
+        i = bisect_left(keys, x * dx)
+        if i == len(keys):
+            return None
+        return self.stops[ray][i]
+
+    def next_block(self, x, y, dx, dy):
+        '''
+        This function does the same as next_stop, but only stops at the blocks
+
+        **Parameters**
+
+            x, y, dx, dy: *int*
+                The position and direction of the lazor
+
+        **Return**
+
+            stop: *tuple*
+                The position of the point, the cell and the block in it,
+                None if the lazor leaves the grid first
+        '''
+        ray = (dx, dy, y - dx * dy * x)
+        keys = self.block_keys.get(ray)
+        if not keys:
+            return None
+        i = bisect_left(keys, x * dx)
+        if i == len(keys):
+            return None
+        return self.blocks[ray][i]
+
+    def place(self, cell, block):
+        '''
+        This function puts a block in an open cell of the index
+
+        **Parameters**
+
+            cell: *tuple*
+                The (x, y) coordination of the cell
+            block: *str*
+                The block put in it
+
+        **Return**
+
+            None
+        '''
+        for keys, blocks, key, point in self.readers[cell]:
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                blocks[i] = point + (block,)
             else:
-                continue
+                keys.insert(i, key)
+                blocks.insert(i, point + (block,))
+
+    def remove(self, cell):
+        '''
+        This function takes the block in a cell out of the index
+
+        **Parameters**
 
+            cell: *tuple*
+                The (x, y) coordination of the cell
 
-def find_fixed_block(smallgrid):
+        **Return**
+
+            None
+        '''
+        for keys, blocks, key, point in self.readers[cell]:
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+                del blocks[i]
+
+    def jump(self, x, y, dx, dy):
+        '''
+        This function finds the stop of next_stop and the holes reached on the
+        way, and keeps them for the next time the same jump is made
+
+        **Parameters**
+
+            x, y, dx, dy: *int*
+                The position and direction of the lazor
+
+        **Return**
+
+            tuple: *tuple, list*
+                The stop and the holes reached
+        '''
+        stop = self.next_stop(x, y, dx, dy)
+        found = self.jumps[(x, y, dx, dy)] = (stop, self.holes_between(x, y, dx, dy, stop))
+        return found
+
+    def holes_between(self, x, y, dx, dy, stop):
+        '''
+        This function finds the holes a lazor going from (x, y) reaches
+        before it stops, the point it stops at included
+
+        **Parameters**
+
+            x, y, dx, dy: *int*
+                The position and direction of the lazor
+            stop: *tuple*
+                The stop from next_stop, None to go on to the edge
+
+        **Return**
+
+            holes: *list*
+                The (x, y) coordinations of the holes
+        '''
+        ray = (dx, dy, y - dx * dy * x)
+        keys = self.hole_keys.get(ray)
+        if keys is None:
+            return []
+        start = bisect_right(keys, x * dx)
+        end = len(keys) if stop is None else bisect_right(keys, stop[0] * dx)
+        return self.holes[ray][start:end]
+
+    def ray(self, x, y, dx, dy):
+        '''
+        This function finds what a lazor going from (x, y) reaches before the
+        first block it meets
+
+        **Parameters**
+
+            x, y, dx, dy: *int*
+                The position and direction of the lazor
+
+        **Return**
+
+            holes: *list*
+                The holes it reaches, the point of the block included
+            stops: *list*
+                The stops of the open cells it meets, as in next_stop
+            block: *tuple*
+                The stop of the block as in next_stop, None if it leaves the
+                grid first
+        '''
+        ray = (dx, dy, y - dx * dy * x)
+        block = None
+        end = len(self.stop_keys.get(ray, []))
+        keys = self.block_keys.get(ray)
+        if keys:
+            i = bisect_left(keys, x * dx)
+            if i < len(keys):
+                block = self.blocks[ray][i]
+                end = bisect_left(self.stop_keys[ray], block[0] * dx)
+        stops = []
+        if end > 0:
+            start = bisect_left(self.stop_keys[ray], x * dx)
+            stops = self.stops[ray][start:end]
+        return self.holes_between(x, y, dx, dy, block), stops, block
+
+
+class IncrementalLazor(Lazor):
     '''
-    This function looks for blocks that were in the original board 
-    so that we wouldn't replace it when generating grids
+    This Function class traces the lazors the same way as Lazor, but keeps the
+    trace and remembers the first step each cell is read in. After some cells
+    of the grid are changed in place, only the steps from the first one that
+    reads a changed cell are simulated again.
 
     **Parameters**
 
-        smallgrid: *list*
-            This is the orignial grid provided by the .bff file
+        grid : *list*
+            A list of list stand for a possible grid of the solution, it is
+            changed in place between two traces
+        lazorlist : *list*
+            A list of list stand for start point and direction of lazor 
+        holelist : *list*
+            A list of list stand for the position of the end point or the hole 
+    '''
 
-    **Return**
+    def __init__(self, grid, lazorlist, holelist, table=None):
+        Lazor.__init__(self, grid, lazorlist, holelist, table)
+        self.solve = False
+        # The lazor the trace stopped at
+        self.k = 0
+        self.paths = []
+        self.result = []
+        self.visited = {}
+        # The first step every cell is read in
+        self.touch = {}
+        # The lazor moved, its length, the number of lazors and the number of
+        # holes passed before every step
+        self.saved = []
+
+    def step(self, lazorlist, k, result):
+        '''
+        This function does the same as Lazor.step, saves the state before it
+        and records the step the cell the lazor meets is first read in
+        '''
+        x, y, dx, dy = lazorlist[k][-1]
+        if x & 1 == 1:
+            cell = (x, y + dy)
+        else:
+            cell = (x + dx, y)
+        if cell not in self.touch:
+            self.touch[cell] = len(self.saved)
+        self.saved.append((k, len(lazorlist[k]), len(lazorlist), len(result)))
+        return Lazor.step(self, lazorlist, k, result)
 
-        position: *list*
-            The coordination of the fixed blocks provided by the game
-    '''
-    position = []
-    for i in range(len(smallgrid)):
-        for j in range(len(smallgrid[0])):
-            block = smallgrid[i][j]
-            if block == 'A' or block == 'B' or block == 'C':
-                position.append([i*2+1, j*2+1])
-    return position
+    def run(self, k):
+        '''
+        This function follows the lazors from the k-th one on
+
+        **Parameters**
+
+            k: *int*
+                The index of the first lazor to follow
+
+        **Return**
 
+            lazorlist: *list*
+                A list contains lasors path, 0 if not all the holes are passed,
+                or a bool in solve mode
+        '''
+        self.k = self.propagate(self.paths, self.result, self.visited, k, stop=self.solve)
+        if self.solve:
+            return len(self.result) == len(self.holelist)
+        if len(self.result) == len(self.holelist):
+            return [path.copy() for path in self.paths]
+        else:
+            return 0
+
+    def lazor_path(self, solve=False):
+        '''
+        This function traces the whole grid and keeps the trace
+
+        **Parameters**
 
-def solver(fptr):
+            solve: *bool*
+                Stop as soon as the last hole is passed, the updates after it
+                go on from where the trace stopped
+
+        **Return**
+
+            lazorlist: *list*
+                A list contains lasors path, 0 if not all the holes are passed,
+                or a bool in solve mode
+        '''
+        self.solve = solve
+        self.paths = [[lazor] for lazor in self.lazorlist]
+        self.result = []
+        self.visited = {}
+        self.touch = {}
+        self.saved = []
+        return self.run(0)
+
+    def update(self, cells):
+        '''
+        This function traces the grid again after some cells are changed, and
+        returns the same as a full trace
+
+        **Parameters**
+
+            cells: *list*
+                The (x, y) coordinations of the changed cells
+
+        **Return**
+
+            lazorlist: *list*
+                A list contains lasors path, 0 if not all the holes are passed,
+                or a bool in solve mode
+        '''
+        first = min([self.touch.get(tuple(cell), len(self.saved)) for cell in cells]
+                    + [len(self.saved)])
+        if first == len(self.saved):
+            return self.run(self.k)
+        # Roll the trace back to the state before the first step affected.
+        # The lazors before the k-th one are finished and the ones after it
+        # have not moved yet.
+        k, length, n_paths, n_result = self.saved[first]
+        del self.paths[n_paths:]
+        del self.paths[k][length:]
+        for path in self.paths[k + 1:]:
+            del path[1:]
+        del self.result[n_result:]
+        del self.saved[first:]
+        # Both dicts are filled in the order of the steps
+        while self.visited and next(reversed(self.visited.values())) >= first:
+            self.visited.popitem()
+        while self.touch and next(reversed(self.touch.values())) >= first:
+            self.touch.popitem()
+        return self.run(k)
+
+
+class TraceCore(object):
+    '''
+    This Function class traces the lazors without making any lists. The board
+    is a bytearray of the codes of BLOCK_CODES, the moves are the ones of a
+    TransitionTable in arrays, the lazors waiting to be followed are states
+    in a preallocated array, and the holes passed are the bits of an int. The
+    states and cells met are stamped with the number of the trace instead of
+    being kept in sets, so nothing is cleared between traces.
+
+    **Parameters**
+
+        table: *TransitionTable*
+            The transitions of the level
+        grid: *list*
+            The full grid the board starts from
+        lazorlist: *list*
+            The lazors
+    '''
+
+    def __init__(self, table, grid, lazorlist):
+        size = len(table.entries)
+        self.width = table.width
+        self.cell = array('l', [-1]) * size
+        for state in range(size):
+            if table.cell_x[state] >= 0:
+                self.cell[state] = table.cell_y[state] * self.width + table.cell_x[state]
+        self.step = array('l', table.step)
+        self.bounce = array('l', table.bounce)
+        self.turn = array('l', table.turn)
+        self.hole_bit = [0 if hole < 0 else 1 << hole for hole in table.hole]
+        self.starts = array('l', [table.state(*lazor) for lazor in lazorlist])
+        # Every state is put on the stack at most once as a lazor split off
+        self.stack = array('l', [0]) * (size + len(self.starts))
+        self.seen = array('L', [0]) * size
+        self.met = array('L', [0]) * (table.length * self.width)
+        # The cells met in the last trace
+        self.touched = array('l', [0]) * (table.length * self.width)
+        self.count = 0
+        self.number = 0
+        self.board = bytearray(table.length * self.width)
+        for y, row in enumerate(grid):
+            for x, block in enumerate(row):
+                self.place(x, y, block)
+
+    def place(self, x, y, block):
+        '''
+        This function puts a block, or 'o' or 'x' for none, in a cell of the board
+        '''
+        self.board[y * self.width + x] = BLOCK_CODES.index(block) if block in BLOCK_CODES else 0
+
+    def trace(self, goal=-1):
+        '''
+        This function follows the lazors on the board
+
+        **Parameters**
+
+            goal: *int*
+                Stop as soon as the holes passed are these bits
+
+        **Return**
+
+            covered: *int*
+                The bits of the holes the lazors have passed
+        '''
+        self.number += 1
+        number = self.number
+        cell = self.cell
+        step = self.step
+        bounce = self.bounce
+        turn = self.turn
+        hole_bit = self.hole_bit
+        board = self.board
+        seen = self.seen
+        met = self.met
+        touched = self.touched
+        stack = self.stack
+        count = 0
+        top = 0
+        for state in self.starts:
+            stack[top] = state
+            top += 1
+        covered = 0
+        while top and covered != goal:
+            top -= 1
+            state = stack[top]
+            while seen[state] != number:
+                seen[state] = number
+                at = cell[state]
+                if at < 0:
+                    break
+                if met[at] != number:
+                    met[at] = number
+                    touched[count] = at
+                    count += 1
+                code = board[at]
+                if code == 2:
+                    covered |= hole_bit[state]
+                    break
+                if code == 1:
+                    state = bounce[state]
+                elif code == 3:
+                    child = step[state]
+                    if seen[child] != number:
+                        stack[top] = child
+                        top += 1
+                    covered |= hole_bit[state] | hole_bit[child]
+                    state = turn[state]
+                    continue
+                else:
+                    state = step[state]
+                covered |= hole_bit[state]
+        self.count = count
+        return covered
+
+    def cells(self):
+        '''
+        This function returns the (x, y) coordinations of the cells met in
+        the last trace
+        '''
+        width = self.width
+        return [(at % width, at // width) for at in self.touched[:self.count]]
+
+
+class BitBoard(object):
+    '''
+    This Function class is a compact board. Every kind of block is one int
+    whose bits stand for the cells (the points with two odd coordinations),
+    the holes are one int whose bits stand for the points of the full grid,
+    and another int records the holes the lazors have passed.
+
+    **Parameters**
+
+        length: *int*
+            The number of rows of the full grid
+        width: *int*
+            The number of columns of the full grid
+        holelist: *list*
+            The positions of the end points
+    '''
+
+    def __init__(self, length, width, holelist):
+        self.length = length
+        self.width = width
+        self.columns = width // 2
+        self.holelist = holelist
+        # 'x' records the cells where no block can be put
+        self.masks = {'A': 0, 'B': 0, 'C': 0, 'x': 0}
+        self.hole_mask = 0
+        for hole in holelist:
+            self.hole_mask |= 1 << self.point_bit(hole[0], hole[1])
+        self.covered = 0
+
+    @classmethod
+    def from_grid(cls, grid, holelist):
+        '''
+        This function builds a BitBoard from a full grid
+
+        **Parameters**
+
+            grid: *list*
+                The full grid in the form of a coordinate system
+            holelist: *list*
+                The positions of the end points
+
+        **Return**
+
+            board: *BitBoard*
+                The same board as bits
+        '''
+        board = cls(len(grid), len(grid[0]), holelist)
+        for y in range(1, board.length, 2):
+            for x in range(1, board.width, 2):
+                if grid[y][x] in board.masks:
+                    board.masks[grid[y][x]] |= 1 << board.cell_bit(x, y)
+        return board
+
+    def cell_bit(self, x, y):
+        '''
+        This function returns the index of the bit of the cell at (x, y)
+        '''
+        return (y >> 1) * self.columns + (x >> 1)
+
+    def point_bit(self, x, y):
+        '''
+        This function returns the index of the bit of the point at (x, y)
+        '''
+        return y * self.width + x
+
+    def cell(self, x, y):
+        '''
+        This function returns the block at (x, y) the same way as grid[y][x]
+        '''
+        if x & y & 1 == 0:
+            return 'x'
+        bit = 1 << self.cell_bit(x, y)
+        for block, mask in self.masks.items():
+            if mask & bit:
+                return block
+        return 'o'
+
+    def combine(self, A=0, B=0, C=0):
+        '''
+        This function returns a new board with the blocks in the bitmasks added
+
+        **Parameters**
+
+            A, B, C: *int*
+                The bitmasks of the cells to put each kind of block into
+
+        **Return**
+
+            board: *BitBoard*
+                The new board
+        '''
+        board = BitBoard.__new__(BitBoard)
+        board.__dict__.update(self.__dict__)
+        board.masks = {'A': self.masks['A'] | A, 'B': self.masks['B'] | B,
+                       'C': self.masks['C'] | C, 'x': self.masks['x']}
+        board.covered = 0
+        return board
+
+    def to_grid(self):
+        '''
+        This function returns the board as a full grid
+        '''
+        return [[self.cell(x, y) for x in range(self.width)] for y in range(self.length)]
+
+    def trace(self, lazorlist):
+        '''
+        This function follows the lazors the same way as Lazor.lazor_path in
+        solve mode, keeping only the holes passed
+
+        **Parameters**
+
+            lazorlist: *list*
+                The first two elements is the positon of the start point, the last two elements are the direction.
+
+        **Return**
+
+            covered: *int*
+                The bits of the holes passed, equal to hole_mask if all of
+                them are passed
+        '''
+        A = self.masks['A']
+        B = self.masks['B']
+        C = self.masks['C']
+        width = self.width
+        length = self.length
+        columns = self.columns
+        holes = self.hole_mask
+        covered = 0
+        visited = set()
+        beams = [tuple(lazor) for lazor in lazorlist]
+        while beams and covered != holes:
+            x, y, dx, dy = beams.pop()
+            while covered != holes:
+                state = (y * width + x) << 2 | (dx > 0) << 1 | (dy > 0)
+                if state in visited:
+                    break
+                visited.add(state)
+                nx = x + dx
+                ny = y + dy
+                if x < 0 or x >= width or y < 0 or y >= length or \
+                        nx < 0 or nx >= width or ny < 0 or ny >= length:
+                    break
+                if x & 1:
+                    bit = 1 << ((ny >> 1) * columns + (x >> 1))
+                else:
+                    bit = 1 << ((y >> 1) * columns + (nx >> 1))
+                if B & bit:
+                    covered |= holes & 1 << (y * width + x)
+                    break
+                if (A | C) & bit:
+                    if C & bit:
+                        if ((ny * width + nx) << 2 | (dx > 0) << 1 | (dy > 0)) not in visited:
+                            beams.append((nx, ny, dx, dy))
+                        covered |= holes & 1 << (ny * width + nx)
+                        covered |= holes & 1 << (y * width + x)
+                    if x & 1:
+                        dy = -dy
+                    else:
+                        dx = -dx
+                    if C & bit:
+                        continue
+                    nx = x + dx
+                    ny = y + dy
+                    # A lazor turned back at the edge leaves the grid
+                    if nx < 0 or nx >= width or ny < 0 or ny >= length:
+                        break
+                x = nx
+                y = ny
+                covered |= holes & 1 << (y * width + x)
+        self.covered = covered
+        return covered
+
+
+def hole_flanks(hole):
+    '''
+    This function finds the two cells on the sides of a hole, a lazor has to
+    come through one of them to reach the hole
+
+    **Parameters**
+
+        hole: *list*
+            The position of the hole
+
+    **Return**
+
+        *tuple*
+            The (x, y) coordinations of the two cells
+    '''
+    x, y = hole[0], hole[1]
+    if x & 1 == 1:
+        return (x, y - 1), (x, y + 1)
+    return (x - 1, y), (x + 1, y)
+
+
+def sealed_flanks(holelist, lazorlist, length, width):
+    '''
+    This function finds the holes that are closed in once both cells next to
+    them hold 'A' or 'B' blocks. A lazor starting on a side of one of these
+    cells is not stopped by it, since after turning on an 'A' block it goes
+    through the cell it started on without meeting it, so the holes with
+    such a lazor, or a lazor starting at the hole, are left out.
+
+    **Parameters**
+
+        holelist: *list*
+            The positions of the end points
+        lazorlist: *list*
+            The lazors
+        length: *int*
+            The length of the full grid
+        width: *int*
+            The width of the full grid
+
+    **Return**
+
+        flanks: *list*
+            The two cells next to every hole that can be closed in
+    '''
+    starts = set((lazor[0], lazor[1]) for lazor in lazorlist or [])
+    flanks = []
+    for hole in holelist:
+        cells = hole_flanks(hole)
+        if any(x < 0 or x >= width or y < 0 or y >= length for x, y in cells):
+            continue
+        if any(point in starts for x, y in cells
+               for point in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]):
+            continue
+        flanks.append(cells)
+    return flanks
+
+
+def obvs_judge(gridfull_temp, possible_list, list_temp, holelist, lazorlist=None):
+    '''
+    This function can skip some obveriously wrong solution, a board is wrong
+    if both cells next to any hole hold 'A' or 'B' blocks, see sealed_flanks
+
+    **Parameters**
+
+        gridfull_temp: *list*
+            The grid about to be solved
+
+        possible_list: *generator*
+            The stream of the remaining permutations of 'ABCo'.
+
+        list_temp: *list*
+            The permutation currently being used.
+
+        holelist: *list*
+            The positions of the end points
+
+        lazorlist: *list*
+            The lazors, a lazor starting next to a hole can reach it even when
+            it is closed in
+
+    **Return**
+
+        *bool*
+            False if a hole can not be reached
+    '''
+    if isinstance(gridfull_temp, BitBoard):
+        length, width = gridfull_temp.length, gridfull_temp.width
+        block = gridfull_temp.cell
+    else:
+        length, width = len(gridfull_temp), len(gridfull_temp[0])
+
+        def block(x, y):
+            return gridfull_temp[y][x]
+    for cells in sealed_flanks(holelist, lazorlist, length, width):
+        # Ruling out grids that have blocks blocking a hole
+        if all(block(x, y) in ['A', 'B'] for x, y in cells):
+            return False
+    return True
+
+
+class HoleFilter(object):
+    '''
+    This Function class does the check of obvs_judge on the blocks put in the
+    open cells instead of on the board. The cells next to every hole are
+    looked up once, so checking an arrangement only takes a few operations
+    on the bits of the cells that hold 'A' or 'B' blocks.
+
+    **Parameters**
+
+        grid: *list*
+            The full grid, the cells not in cells keep their blocks
+        cells: *list*
+            The (x, y) coordinations of the cells the blocks are put in
+        holelist: *list*
+            The positions of the end points
+        lazorlist: *list*
+            The lazors
+    '''
+
+    def __init__(self, grid, cells, holelist, lazorlist):
+        index = dict((cell, i) for i, cell in enumerate(cells))
+        # A hole closed in by the fixed blocks can never be reached
+        self.always = False
+        # The cells that close a hole in alone, and the pairs of cells that do
+        self.singles = 0
+        self.pairs = []
+        for flanks in sealed_flanks(holelist, lazorlist, len(grid), len(grid[0])):
+            mask = 0
+            for x, y in flanks:
+                if (x, y) in index:
+                    mask |= 1 << index[(x, y)]
+                elif grid[y][x] not in ['A', 'B']:
+                    break
+            else:
+                if mask == 0:
+                    self.always = True
+                elif mask & (mask - 1) == 0:
+                    self.singles |= mask
+                else:
+                    self.pairs.append(mask)
+
+    def mask(self, blocks):
+        '''
+        This function returns the bits of the cells holding 'A' or 'B' blocks
+
+        **Parameters**
+
+            blocks: *list*
+                The blocks in the cells, in the order of the cells
+        '''
+        blocked = 0
+        for i, block in enumerate(blocks):
+            if block == 'A' or block == 'B':
+                blocked |= 1 << i
+        return blocked
+
+    def seals(self, blocked):
+        '''
+        This function checks if a hole is closed in
+
+        **Parameters**
+
+            blocked: *int*
+                The bits of the cells holding 'A' or 'B' blocks
+
+        **Return**
+
+            *bool*
+                True if a hole can not be reached
+        '''
+        if self.always or blocked & self.singles:
+            return True
+        for pair in self.pairs:
+            if blocked & pair == pair:
+                return True
+        return False
+
+
+def gen_permutations(blocks):
+    '''
+    Generate the distinct permutations of the blocks one at a time. The
+    permutations come out in reverse lexicographic order, which is the order
+    the full list of multiset permutations used to be consumed from its back,
+    so only the current permutation is ever kept in memory.
+
+    **Parameters**
+
+        blocks: *list*
+            The blocks and blank positions to be arranged
+
+    **Yield**
+
+        permutation: *list*
+            A new list holding one arrangement of the blocks
+    '''
+    permutation = sorted(blocks, reverse=True)
+    n = len(permutation)
+    while True:
+        yield list(permutation)
+        # Find the last position that can be decreased
+        i = n - 2
+        while i >= 0 and permutation[i] <= permutation[i + 1]:
+            i -= 1
+        if i < 0:
+            return
+        # Swap it with the largest smaller element on its right
+        j = n - 1
+        while permutation[j] >= permutation[i]:
+            j -= 1
+        permutation[i], permutation[j] = permutation[j], permutation[i]
+        permutation[i + 1:] = permutation[:i:-1]
+
+
+def _revolving_door(n, k, reverse=False):
+    '''
+    Generate the k element subsets of n positions as bitmasks in revolving
+    door order, two subsets in a row always differ by one position in and
+    one position out
+    '''
+    if k == 0:
+        yield 0
+    elif k == n:
+        yield (1 << n) - 1
+    elif not reverse:
+        yield from _revolving_door(n - 1, k)
+        for mask in _revolving_door(n - 1, k - 1, reverse=True):
+            yield mask | 1 << (n - 1)
+    else:
+        for mask in _revolving_door(n - 1, k - 1):
+            yield mask | 1 << (n - 1)
+        yield from _revolving_door(n - 1, k, reverse=True)
+
+
+def gen_minimal_change(blocks):
+    '''
+    Generate the same permutations as gen_permutations, but in an order where
+    every permutation is the one before with two positions swapped. The
+    positions of the 'A' blocks follow a revolving door order, for every one
+    of them the positions of the 'B' blocks among the positions left follow
+    a revolving door order forwards or backwards, and the same for 'C'.
+
+    **Parameters**
+
+        blocks: *list*
+            The blocks and blank positions to be arranged
+
+    **Yield**
+
+        permutation: *list*
+            A new list holding one arrangement of the blocks
+        swap: *tuple*
+            The two positions swapped from the permutation before, None for
+            the first permutation
+    '''
+    kinds = [block for block in ['A', 'B', 'C'] if block in blocks]
+    counts = [blocks.count(block) for block in kinds]
+    permutation = ['o'] * len(blocks)
+    # The positions every kind of block can go to, and the bitmask of the
+    # ones it is at, as indices into those positions
+    spaces = []
+    masks = []
+    space = list(range(len(blocks)))
+    for block, count in zip(kinds, counts):
+        spaces.append(space.copy())
+        masks.append((1 << count) - 1)
+        for i in space[:count]:
+            permutation[i] = block
+        space = space[count:]
+
+    # Every kind of block goes through its order forwards and backwards in turn
+    reverse = [False] * len(kinds)
+
+    def walk(level):
+        if level == len(kinds):
+            yield None
+            return
+        masks_level = _revolving_door(len(spaces[level]), counts[level], reverse[level])
+        reverse[level] = not reverse[level]
+        next(masks_level)
+        yield from walk(level + 1)
+        for mask in masks_level:
+            out = masks[level] & ~mask
+            into = mask & ~masks[level]
+            masks[level] = mask
+            i = spaces[level][out.bit_length() - 1]
+            j = spaces[level][into.bit_length() - 1]
+            permutation[i], permutation[j] = permutation[j], permutation[i]
+            # The position left takes the place of the one filled for the
+            # blocks inside, so their bitmasks stay the same
+            for space in spaces[level + 1:]:
+                if j in space:
+                    space[space.index(j)] = i
+            for visit in walk(level + 1):
+                yield (i, j) if visit is None else visit
+
+    for swap in walk(0):
+        yield list(permutation), swap
+
+
+class NogoodStore(object):
+    '''
+    This Function class remembers the boards that failed by the cells the
+    lazors read on them. Every board holding the same blocks in those cells
+    sends the lazors along the same path, so it fails too and does not need
+    to be traced. The failed boards are kept in a trie over the cells in the
+    order they are filled, so a board is only compared with the failed boards
+    that agree with it so far.
+
+    **Parameters**
+
+        cells: *list*
+            The (x, y) coordinations of the cells the blocks can be put in
+        capacity: *int*
+            The most failed boards kept, the one used least recently is
+            forgotten first, None keeps all of them
+    '''
+
+    def __init__(self, cells, capacity=None):
+        self.order = dict((cell, i) for i, cell in enumerate(cells))
+        self.capacity = capacity
+        # A node maps a cell to the nodes for the blocks in it, the key None
+        # ends a failed board and keeps its cells and blocks
+        self.root = {}
+        # The failed boards from the one used least recently to the last one
+        self.entries = OrderedDict()
+        # Boards in a row mostly fail for the same reasons, so the failed
+        # boards found last are compared first
+        self.recent = []
+        # The failed board the last board matched
+        self.hit = None
+
+    def add(self, grid, touched):
+        '''
+        This function remembers the blocks in the cells touched on a failed board
+
+        **Parameters**
+
+            grid: *list*
+                The failed board
+            touched: *iterable*
+                The (x, y) coordinations of the cells the lazors read
+        '''
+        key = sorted((cell for cell in touched if cell in self.order), key=self.order.get)
+        node = self.root
+        for x, y in key:
+            # A failed board that needs fewer cells already covers this one
+            if None in node:
+                return
+            node = node.setdefault((x, y), {}).setdefault(grid[y][x], {})
+        # And this one covers the ones that need more cells
+        stack = [node]
+        while stack:
+            below = stack.pop()
+            if None in below:
+                self.forget(below[None])
+            else:
+                for blocks in below.values():
+                    stack.extend(blocks.values())
+        node.clear()
+        entry = tuple((x, y, grid[y][x]) for x, y in key)
+        node[None] = entry
+        self.entries[entry] = None
+        if self.capacity is not None and len(self.entries) > self.capacity:
+            self.remove(next(iter(self.entries)))
+
+    def forget(self, entry):
+        '''
+        This function drops a failed board from entries and recent
+        '''
+        del self.entries[entry]
+        if entry in self.recent:
+            self.recent.remove(entry)
+
+    def remove(self, entry):
+        '''
+        This function takes a failed board out of the trie, with the nodes
+        that only lead to it
+        '''
+        self.forget(entry)
+        path = []
+        node = self.root
+        for x, y, block in entry:
+            path.append((node, (x, y), block))
+            node = node[(x, y)][block]
+        del node[None]
+        for parent, cell, block in reversed(path):
+            if parent[cell][block]:
+                break
+            del parent[cell][block]
+            if parent[cell]:
+                break
+            del parent[cell]
+
+    def match(self, grid):
+        '''
+        This function checks if a board agrees with a failed board in every
+        cell the lazors read on it, the failed board is kept in hit
+
+        **Parameters**
+
+            grid: *list*
+                The board to check
+
+        **Return**
+
+            *bool*
+                True if the board is known to fail
+        '''
+        for failed in self.recent:
+            for x, y, block in failed:
+                if grid[y][x] != block:
+                    break
+            else:
+                self.hit = failed
+                self.entries.move_to_end(failed)
+                return True
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if None in node:
+                self.hit = node[None]
+                self.entries.move_to_end(self.hit)
+                self.recent.insert(0, self.hit)
+                del self.recent[8:]
+                return True
+            for cell, blocks in node.items():
+                child = blocks.get(grid[cell[1]][cell[0]])
+                if child is not None:
+                    stack.append(child)
+        return False
+
+
+def _unless_cancelled(items, cancel):
+    '''
+    Go through items until the cancel event of a search is set
+    '''
+    for n, item in enumerate(items):
+        # Checking the event is not free, so only do it once in a while
+        if cancel is not None and n & 255 == 0 and cancel.is_set():
+            return
+        yield item
+
+
+def search_permutations(grid, prefix, blocks, lazorlist, holelist, position, cancel=None,
+                        order='lex', rules=None):
+    '''
+    Try the boards whose first open cells hold the blocks in prefix and whose
+    other open cells hold one permutation of blocks, and return the first
+    right one
+
+    **Parameters**
+
+        grid: *list*
+            The full grid in the form of a coordinate system
+        prefix: *list*
+            The blocks fixed at the first open cells
+        blocks: *list*
+            The blocks and blank positions to be permuted over the other open cells
+        lazorlist: *list*
+            The first two elements is the positon of the start point, the last two elements are the direction.
+        holelist: *list*
+            The positions of the end points
+        position: *list*
+            A list store the pre-placed blocks
+        cancel: *Event*
+            Stop early and return None once this event is set
+        order: *str*
+            'lex' goes through the permutations in reverse lexicographic order,
+            'gray' in an order where only two cells change from board to board
+        rules: *dict*
+            The blocks the open cells can hold from find_constraints, the
+            boards breaking them are skipped
+
+    **Return**
+
+        solution: *list*
+            The positions and directions laser passed
+        list_temp_save: *list*
+            One possible permutation of blocks
+        test_board: *list*
+            The full grid in coordination
+    '''
+    # Stream the permutations of blocks and blank postion one by one
+    if order == 'gray':
+        list_Blocks = gen_minimal_change(blocks)
+    else:
+        list_Blocks = ((list_temp, None) for list_temp in gen_permutations(blocks))
+    board = Grid([row.copy() for row in grid])
+    open_cells = board.open_cells(position)
+    test_board = board.origrid
+    # The boards are all generated in one working board, so one tracer
+    # follows them, its moves are looked up in a table compiled once for the
+    # level. The boards of the gray order only change in two cells, so an
+    # IncrementalLazor keeps the trace and only traces again from the first
+    # step a changed cell is read in, the others are traced by a TraceCore
+    # with only the changed cells written into its board
+    table = TransitionTable(len(grid), len(grid[0]), holelist)
+    if order == 'gray':
+        lazor = IncrementalLazor(test_board, lazorlist, holelist, table)
+    else:
+        core = TraceCore(table, test_board, lazorlist)
+    goal = (1 << len(holelist)) - 1
+    nogoods = NogoodStore(open_cells)
+    holes = HoleFilter(grid, open_cells, holelist, lazorlist)
+    checks = [(i, rules[cell]) for i, cell in enumerate(open_cells) if cell in (rules or {})]
+    traced = None
+
+    for list_temp, swap in _unless_cancelled(list_Blocks, cancel):
+        # A new list, gen_grid only reads it so it is kept as it is
+        list_temp = prefix + list_temp
+        list_temp_save = list_temp
+        if swap is None:
+            # Rule out the boards closing in a hole before building them,
+            # the first board of the gray order is always built since the
+            # others are made from it
+            blocked = holes.mask(list_temp)
+            if order != 'gray' and (holes.seals(blocked) or any(
+                    list_temp[i] not in allowed for i, allowed in checks)):
+                continue
+            # Generate a board from grid function
+            board.gen_grid(list_temp, position)
+        else:
+            # Only the two swapped cells of the board change
+            for i in swap:
+                j = len(prefix) + i
+                x, y = open_cells[j]
+                test_board[y][x] = list_temp_save[j]
+                if list_temp_save[j] == 'A' or list_temp_save[j] == 'B':
+                    blocked |= 1 << j
+                else:
+                    blocked &= ~(1 << j)
+        # Test the board with the hole filter and run it through Lazor to see if it is the right board
+        if not holes.seals(blocked) and not nogoods.match(test_board) and \
+                not any(list_temp_save[i] not in allowed for i, allowed in checks):
+            if order != 'gray':
+                for (x, y), old, new in zip(open_cells, traced or [None] * len(open_cells),
+                                            list_temp_save):
+                    if old != new:
+                        core.place(x, y, new)
+                solved = core.trace(goal) == goal
+            elif traced is None:
+                solved = lazor.lazor_path(solve=True)
+            else:
+                solved = lazor.update([cell for cell, old, new in zip(
+                    open_cells, traced, list_temp_save) if old != new])
+            traced = list_temp_save
+            # Only the right board is traced again for the whole path of lazors
+            if solved:
+                solution = Lazor(test_board, lazorlist, holelist).lazor_path()
+                return solution, list_temp_save, [row.copy() for row in test_board]
+            else:
+                nogoods.add(test_board, lazor.touch if order == 'gray' else core.cells())
+
+
+def gen_combinations(blocks, reject=None, at_most=False):
+    '''
+    Generate the arrangements of the blocks as the positions every kind of
+    block is put at, first the positions of the 'A' blocks, then the
+    positions of the 'B' blocks among the ones left, then the 'C' blocks
+
+    **Parameters**
+
+        blocks: *list*
+            The blocks and blank positions to be arranged
+        reject: *function*
+            Called with the positions chosen so far after every kind of
+            block, the arrangements starting with them are skipped if it
+            returns True
+        at_most: *bool*
+            Also generate the arrangements using fewer blocks of each kind,
+            the ones using the fewest blocks first
+
+    **Yield**
+
+        choice: *tuple*
+            A tuple of positions for every kind of block in 'ABC' that is
+            in blocks
+    '''
+    counts = [blocks.count(block) for block in ['A', 'B', 'C'] if block in blocks]
+    if at_most:
+        sizes = sorted(product(*[range(count + 1) for count in counts]), key=sum)
+    else:
+        sizes = [counts]
+
+    def choose(level, free, head, counts):
+        if level == len(counts):
+            yield ()
+            return
+        for chosen in combinations(free, counts[level]):
+            if reject is not None and reject(head + (chosen,)):
+                continue
+            if level + 1 == len(counts):
+                yield (chosen,)
+                continue
+            taken = set(chosen)
+            rest = [i for i in free if i not in taken]
+            for inner in choose(level + 1, rest, head + (chosen,), counts):
+                yield (chosen,) + inner
+
+    for size in sizes:
+        yield from choose(0, list(range(len(blocks))), (), size)
+
+
+def hole_rejecter(grid, free, blocks, lazorlist, holelist, rules=None):
+    '''
+    This function makes the reject function gen_combinations uses to skip
+    the arrangements that close in a hole, see HoleFilter, or break the rules
+    of find_constraints
+
+    **Parameters**
+
+        grid: *list*
+            The full grid, with the blocks of the other cells in it
+        free: *list*
+            The (x, y) coordinations of the cells gen_combinations arranges
+        blocks: *list*
+            The blocks and blank positions to be arranged
+        lazorlist: *list*
+            The lazors
+        holelist: *list*
+            The positions of the end points
+        rules: *dict*
+            The blocks the cells can hold from find_constraints
+
+    **Return**
+
+        reject: *function*
+            True for the positions of blocks that close in a hole
+    '''
+    holes = HoleFilter(grid, free, holelist, lazorlist)
+    kinds = [block for block in ['A', 'B', 'C'] if block in blocks]
+    # The bits of the cells that can not hold each kind of block, and of the
+    # ones that can not be left empty
+    forbidden = dict((block, 0) for block in kinds)
+    required = 0
+    broken = False
+    for (x, y), allowed in (rules or {}).items():
+        if (x, y) not in free:
+            broken = broken or grid[y][x] not in allowed
+            continue
+        i = free.index((x, y))
+        for block in kinds:
+            if block not in allowed:
+                forbidden[block] |= 1 << i
+        if 'o' not in allowed:
+            required |= 1 << i
+
+    def reject(choice):
+        if broken:
+            return True
+        block = kinds[len(choice) - 1]
+        if forbidden[block] or required:
+            placed = 0
+            for i in choice[-1]:
+                placed |= 1 << i
+            if placed & forbidden[block]:
+                return True
+            if len(choice) == len(kinds):
+                for indices in choice[:-1]:
+                    for i in indices:
+                        placed |= 1 << i
+                if required & ~placed:
+                    return True
+        # 'C' blocks let the lazors through, so they never close a hole in
+        if block == 'C':
+            return False
+        blocked = 0
+        for block, indices in zip(kinds, choice):
+            if block != 'C':
+                for i in indices:
+                    blocked |= 1 << i
+        return holes.seals(blocked)
+
+    return reject
+
+
+def _working_board(grid, prefix, blocks, position):
+    '''
+    Set up the working board of a search over the combinations of blocks
+
+    **Parameters**
+
+        The same parameters as search_permutations
+
+    **Return**
+
+        kinds: *list*
+            The kinds of blocks to place, in the order gen_combinations uses
+        board: *Grid*
+            The working board over a copy of grid
+        open_cells: *list*
+            The open cells of the board
+        test_board: *list*
+            The full grid of the board, with the blocks of prefix at the
+            first open cells and the other open cells empty
+        free: *list*
+            The open cells the blocks are placed in
+    '''
+    kinds = [block for block in ['A', 'B', 'C'] if block in blocks]
+    board = Grid([row.copy() for row in grid])
+    open_cells = board.open_cells(position)
+    test_board = board.gen_grid(prefix + ['o'] * len(blocks), position)
+    return kinds, board, open_cells, test_board, open_cells[len(prefix):]
+
+
+def _place_choices(board, kinds, free, choices, cancel):
+    '''
+    Put the blocks of every choice of gen_combinations into the working
+    board in turn, until the cancel event is set. Every block put in is one
+    entry of the undo log, so the blocks the last board has in common with
+    the next one from the start are kept, the others are taken back out and
+    the new ones put in.
+
+    **Parameters**
+
+        board: *Grid*
+            The working board from _working_board
+        kinds: *list*
+            The kinds of blocks to place
+        free: *list*
+            The open cells the blocks are placed in
+        choices: *iter*
+            The choices from gen_combinations
+        cancel: *Event*
+            Stop once this event is set
+
+    **Return**
+
+        *iter*
+            For every choice, the choice, the (cell, block) pairs taken out
+            and the (cell, block) pairs put in
+    '''
+    placed = []
+    for choice in _unless_cancelled(choices, cancel):
+        chosen = [(free[i], block) for block, indices in zip(kinds, choice) for i in indices]
+        same = 0
+        while same < len(placed) and same < len(chosen) and placed[same] == chosen[same]:
+            same += 1
+        board.revert(same)
+        board.apply([cell for cell, block in chosen[same:]],
+                    [block for cell, block in chosen[same:]])
+        yield choice, placed[same:], chosen[same:]
+        placed = chosen
+
+
+def search_combinations(grid, prefix, blocks, lazorlist, holelist, position, cancel=None,
+                        at_most=False, rules=None):
+    '''
+    Do the same search as search_permutations, but choose the positions of
+    the blocks among the open cells instead of permuting every open cell.
+    Only the cells whose block changes are written into the board, so each
+    board costs a few steps for every block instead of a step for every cell.
+    With at_most, boards using fewer blocks than there are are tried first,
+    once one lets the lazors reach every hole the blocks left over are put in
+    cells no lazor went through.
+
+    **Parameters**
+
+        The same parameters as search_permutations, and
+
+        at_most: *bool*
+            Try the boards with fewer blocks first
+        rules: *dict*
+            The blocks the open cells can hold from find_constraints
+
+    **Return**
+
+        The same parameters as search_permutations
+    '''
+    kinds, board, open_cells, test_board, free = _working_board(grid, prefix, blocks, position)
+    table = TransitionTable(len(grid), len(grid[0]), holelist)
+    core = TraceCore(table, test_board, lazorlist)
+    goal = (1 << len(holelist)) - 1
+    nogoods = NogoodStore(open_cells)
+    reject = hole_rejecter(test_board, free, blocks, lazorlist, holelist, rules)
+    choices = gen_combinations(blocks, reject, at_most)
+
+    for choice, taken, put in _place_choices(board, kinds, free, choices, cancel):
+        for (x, y), block in taken:
+            core.place(x, y, 'o')
+        for (x, y), block in put:
+            core.place(x, y, block)
+        if not nogoods.match(test_board):
+            if core.trace(goal) != goal:
+                nogoods.add(test_board, core.cells())
+                continue
+            leftover = []
+            for block, indices in zip(kinds, choice):
+                leftover += [block] * (blocks.count(block) - len(indices))
+            touched = set(core.cells())
+            spare = [(x, y) for x, y in free
+                     if test_board[y][x] == 'o' and (x, y) not in touched]
+            if len(spare) < len(leftover):
+                continue
+            board.apply(spare, leftover)
+            solution = Lazor(test_board, lazorlist, holelist).lazor_path()
+            list_temp_save = [test_board[y][x] for x, y in open_cells]
+            found = [row.copy() for row in test_board]
+            board.revert()
+            return solution, list_temp_save, found
+    board.revert()
+
+
+def search_bitboards(grid, prefix, blocks, lazorlist, holelist, position, cancel=None,
+                     rules=None):
+    '''
+    Do the same search as search_combinations on BitBoard candidates, so a
+    board is built by OR-ing the bits of the chosen cells together
+
+    **Parameters**
+
+        The same parameters as search_combinations
+
+    **Return**
+
+        The same parameters as search_permutations
+    '''
+    kinds, board, open_cells, start, free = _working_board(grid, prefix, blocks, position)
+    base = BitBoard.from_grid(start, holelist)
+    bits = [1 << base.cell_bit(x, y) for x, y in free]
+    reject = hole_rejecter(start, free, blocks, lazorlist, holelist, rules)
+
+    for choice in _unless_cancelled(gen_combinations(blocks, reject), cancel):
+        masks = {}
+        for block, indices in zip(kinds, choice):
+            mask = 0
+            for i in indices:
+                mask |= bits[i]
+            masks[block] = mask
+        test_board = base.combine(**masks)
+        if test_board.trace(lazorlist) == test_board.hole_mask:
+            test_board = test_board.to_grid()
+            solution = Lazor(test_board, lazorlist, holelist).lazor_path()
+            list_temp_save = [test_board[y][x] for x, y in open_cells]
+            return solution, list_temp_save, test_board
+
+
+def search_jumps(grid, prefix, blocks, lazorlist, holelist, position, cancel=None,
+                 rules=None):
+    '''
+    Do the same search as search_combinations, but trace the candidates with
+    the lazors jumping from block to block along a LineIndex, the blocks
+    taken away and put in are changed in the index as they are in the board
+
+    **Parameters**
+
+        The same parameters as search_combinations
+
+    **Return**
+
+        The same parameters as search_permutations
+    '''
+    kinds, board, open_cells, test_board, free = _working_board(grid, prefix, blocks, position)
+    lines = LineIndex(test_board, holelist)
+    # The lazors are moved through the blocks by the table
+    table = TransitionTable(len(grid), len(grid[0]), holelist)
+    lazor = Lazor(test_board, lazorlist, holelist, table, lines)
+    reject = hole_rejecter(test_board, free, blocks, lazorlist, holelist, rules)
+
+    for choice, taken, put in _place_choices(board, kinds, free,
+                                             gen_combinations(blocks, reject), cancel):
+        # The index follows the board, but changing the index costs more so
+        # only the blocks that moved are changed
+        taken = dict(taken)
+        put = dict(put)
+        for cell, block in taken.items():
+            if put.get(cell) != block:
+                lines.remove(cell)
+        for cell, block in put.items():
+            if taken.get(cell) != block:
+                lines.place(cell, block)
+        if lazor.lazor_path(solve=True):
+            solution = Lazor(test_board, lazorlist, holelist).lazor_path()
+            list_temp_save = [test_board[y][x] for x, y in open_cells]
+            found = [row.copy() for row in test_board]
+            board.revert()
+            return solution, list_temp_save, found
+    board.revert()
+
+
+def encode_grid(grid):
+    '''
+    Turn a full grid into a numpy array, with 0 for no block and the index in
+    BLOCK_CODES for the blocks
+
+    **Parameters**
+
+        grid: *list*
+            The full grid in the form of a coordinate system
+
+    **Return**
+
+        board: *ndarray*
+            A uint8 array of the same shape as grid
+    '''
+    if np is None:
+        raise ImportError('Tracing boards in batches needs numpy')
+    return np.array([[BLOCK_CODES.index(block) if block in BLOCK_CODES else 0
+                      for block in row] for row in grid], dtype=np.uint8)
+
+
+def batch_trace(boards, lazorlist, holelist):
+    '''
+    Follow the lazors on many boards at once. All the live lazors of all the
+    boards are moved one step together with numpy gathers and scatters, with
+    the same rules as Lazor.lazor_path, until no lazor is left.
+
+    **Parameters**
+
+        boards: *ndarray*
+            An (N, length, width) uint8 array of full grids, with 0 for no
+            block and the index in BLOCK_CODES for the blocks
+        lazorlist: *list*
+            The first two elements is the positon of the start point, the last two elements are the direction.
+        holelist: *list*
+            The positions of the end points
+
+    **Return**
+
+        solved: *ndarray*
+            An (N,) bool array, True for the boards whose lazors pass every hole
+        paths: *dict*
+            The lazor path of every solved board, by its index
+    '''
+    if np is None:
+        raise ImportError('Tracing boards in batches needs numpy')
+    boards = np.asarray(boards, dtype=np.uint8)
+    n, length, width = boards.shape
+    n_lazor = len(lazorlist)
+    # A refract block splits a lazor at most once for each of its 4 sides and
+    # 2 directions, as a lazor coming back the same way is stopped
+    n_c = int((boards == 3).sum(axis=(1, 2)).max()) if n else 0
+    slots = n_lazor + 8 * n_c
+    x = np.zeros((n, slots), np.int64)
+    y = np.zeros((n, slots), np.int64)
+    dx = np.zeros((n, slots), np.int64)
+    dy = np.zeros((n, slots), np.int64)
+    alive = np.zeros((n, slots), bool)
+    for k, lazor in enumerate(lazorlist):
+        x[:, k], y[:, k], dx[:, k], dy[:, k] = lazor
+        alive[:, k] = True
+    used = np.full(n, n_lazor, np.int64)
+    hole_id = np.full((length, width), -1, np.int64)
+    for i, hole in enumerate(holelist):
+        hole_id[hole[1], hole[0]] = i
+    covered = np.zeros((n, len(holelist)), bool)
+    visited = np.zeros((n, length, width, 4), bool)
+
+    def cover(b, px, py):
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < length)
+        b, px, py = b[inside], px[inside], py[inside]
+        hole = hole_id[py, px]
+        covered[b[hole >= 0], hole[hole >= 0]] = True
+
+    while True:
+        b, s = np.nonzero(alive)
+        if len(b) == 0:
+            break
+        X, Y, DX, DY = x[b, s], y[b, s], dx[b, s], dy[b, s]
+        NX, NY = X + DX, Y + DY
+        d = (DX > 0) * 2 + (DY > 0)
+        keep = (X >= 0) & (X < width) & (Y >= 0) & (Y < length) & \
+            (NX >= 0) & (NX < width) & (NY >= 0) & (NY < length)
+        # Stop the lazors in a state already visited, and all but one of the
+        # lazors of a board in the same state
+        state = ((b * length + np.clip(Y, 0, length - 1)) * width
+                 + np.clip(X, 0, width - 1)) * 4 + d
+        first = np.zeros(len(b), bool)
+        first[np.unique(state, return_index=True)[1]] = True
+        keep &= first
+        keep[keep] &= ~visited[b[keep], Y[keep], X[keep], d[keep]]
+        alive[b[~keep], s[~keep]] = False
+        b, s, X, Y, DX, DY, NX, NY, d = \
+            b[keep], s[keep], X[keep], Y[keep], DX[keep], DY[keep], NX[keep], NY[keep], d[keep]
+        visited[b, Y, X, d] = True
+        # The cell the lazor is about to pass
+        odd = (X & 1) == 1
+        code = boards[b, np.where(odd, NY, Y), np.where(odd, X, NX)]
+        absorbed = code == 2
+        split = code == 3
+        turn = (code == 1) | split
+        RDX = np.where(turn & ~odd, -DX, DX)
+        RDY = np.where(turn & odd, -DY, DY)
+        # The lazors passing through a refract block go on as new lazors
+        sb = b[split]
+        if len(sb):
+            rank = np.arange(len(sb)) - np.searchsorted(sb, sb)
+            slot = used[sb] + rank
+            x[sb, slot], y[sb, slot] = NX[split], NY[split]
+            dx[sb, slot], dy[sb, slot] = DX[split], DY[split]
+            alive[sb, slot] = True
+            np.add.at(used, sb, 1)
+            cover(sb, NX[split], NY[split])
+        MX = np.where(split | absorbed, X, np.where(turn, X + RDX, NX))
+        MY = np.where(split | absorbed, Y, np.where(turn, Y + RDY, NY))
+        cover(b, MX, MY)
+        x[b, s], y[b, s], dx[b, s], dy[b, s] = MX, MY, RDX, RDY
+        alive[b[absorbed], s[absorbed]] = False
+        # A board whose holes are all passed needs no more steps
+        alive[covered.all(axis=1)] = False
+
+    solved = covered.all(axis=1)
+    paths = {}
+    for i in np.flatnonzero(solved):
+        paths[int(i)] = Lazor(decode_board(boards[i]), lazorlist, holelist).lazor_path()
+    return solved, paths
+
+
+def decode_board(board):
+    '''
+    Turn a board encoded by encode_grid back into a full grid, with 'o' for
+    the cells without blocks and 'x' for the other points
+    '''
+    length, width = board.shape
+    return [[BLOCK_CODES[board[y, x]] if x & y & 1 else 'x' for x in range(width)]
+            for y in range(length)]
+
+
+def search_batched(grid, prefix, blocks, lazorlist, holelist, position, cancel=None,
+                   chunk=4096, rules=None):
+    '''
+    Do the same search as search_combinations, but trace the candidates in
+    chunks with batch_trace
+
+    **Parameters**
+
+        The same parameters as search_combinations, and
+
+        chunk: *int*
+            The number of candidates traced at once
+
+    **Return**
+
+        The same parameters as search_permutations
+    '''
+    kinds, board, open_cells, test_board, free = _working_board(grid, prefix, blocks, position)
+    base = encode_grid(test_board)
+    candidates = gen_combinations(blocks, hole_rejecter(test_board, free, blocks, lazorlist,
+                                                        holelist, rules))
+    while cancel is None or not cancel.is_set():
+        choices = list(islice(candidates, chunk))
+        if len(choices) == 0:
+            return None
+        rows, ys, xs, codes = [], [], [], []
+        for i, choice in enumerate(choices):
+            for block, indices in zip(kinds, choice):
+                for j in indices:
+                    rows.append(i)
+                    xs.append(free[j][0])
+                    ys.append(free[j][1])
+                    codes.append(BLOCK_CODES.index(block))
+        boards = np.repeat(base[None], len(choices), axis=0)
+        boards[rows, ys, xs] = codes
+        solved, paths = batch_trace(boards, lazorlist, holelist)
+        if solved.any():
+            i = int(np.flatnonzero(solved)[0])
+            for block, indices in zip(kinds, choices[i]):
+                board.apply([free[j] for j in indices], [block] * len(indices))
+            list_temp_save = [test_board[y][x] for x, y in open_cells]
+            found = [row.copy() for row in test_board]
+            board.revert()
+            return paths[i], list_temp_save, found
+
+
+def search_placements(grid, prefix, blocks, lazorlist, holelist, position, cancel=None,
+                      order='lex', rules=None):
+    '''
+    Run the search for the order given, see find_path for the orders
+
+    **Parameters**
+
+        The same parameters as search_permutations
+
+    **Return**
+
+        The same parameters as search_permutations
+    '''
+    if order == 'combination' or order == 'surplus':
+        return search_combinations(grid, prefix, blocks, lazorlist, holelist, position,
+                                   cancel=cancel, at_most=order == 'surplus', rules=rules)
+    if order == 'jump':
+        return search_jumps(grid, prefix, blocks, lazorlist, holelist,
+                            position, cancel=cancel, rules=rules)
+    if order == 'bitboard':
+        return search_bitboards(grid, prefix, blocks, lazorlist, holelist,
+                                position, cancel=cancel, rules=rules)
+    if order == 'batch':
+        return search_batched(grid, prefix, blocks, lazorlist, holelist,
+                              position, cancel=cancel, rules=rules)
+    return search_permutations(grid, prefix, blocks, lazorlist, holelist,
+                               position, cancel=cancel, order=order, rules=rules)
+
+
+def gen_shards(blocks, number):
+    '''
+    Split the permutations of blocks into shards that share the same first
+    blocks, and keep splitting until there are at least number shards
+
+    **Parameters**
+
+        blocks: *list*
+            The blocks and blank positions to be arranged
+        number: *int*
+            The least number of shards wanted
+
+    **Return**
+
+        shards: *list*
+            A list of (prefix, rest) pairs, every permutation of blocks is
+            one prefix followed by one permutation of its rest
+    '''
+    shards = [([], sorted(blocks, reverse=True))]
+    while len(shards) < number and len(shards[0][1]) > 1:
+        new_shards = []
+        for prefix, rest in shards:
+            for block in sorted(set(rest), reverse=True):
+                new_rest = rest.copy()
+                new_rest.remove(block)
+                new_shards.append((prefix + [block], new_rest))
+        shards = new_shards
+    return shards
+
+
+# The event telling the workers of a parallel search to stop
+_cancel = None
+
+
+def _init_worker(cancel):
+    '''
+    Store the cancel event in every worker process of the pool
+    '''
+    global _cancel
+    _cancel = cancel
+
+
+def _search_shard(grid, prefix, blocks, lazorlist, holelist, position, order, rules):
+    '''
+    Search one shard in a worker process of the pool
+    '''
+    return search_placements(grid, prefix, blocks, lazorlist, holelist,
+                             position, cancel=_cancel, order=order, rules=rules)
+
+
+def find_path_parallel(grid, blocks, lazorlist, holelist, position, workers, order='lex',
+                       rules=None):
+    '''
+    Search the shards of the permutations in a pool of processes, and stop
+    every process as soon as one of them finds the right grid
+
+    **Parameters**
+
+        grid: *list*
+            The full grid in the form of a coordinate system
+        blocks: *list*
+            The blocks and blank positions to be arranged
+        lazorlist: *list*
+            The first two elements is the positon of the start point, the last two elements are the direction.
+        holelist: *list*
+            The positions of the end points
+        position: *list*
+            A list store the pre-placed blocks
+        workers: *int*
+            The number of processes
+        order: *str*
+            The order every shard goes through its permutations in
+        rules: *dict*
+            The blocks the open cells can hold from find_constraints
+
+    **Return**
+
+        The same parameters as find_path
+    '''
+    cancel = multiprocessing.Event()
+    # More shards than workers so a fast shard does not leave a core idle
+    shards = gen_shards(blocks, workers * 8)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cancel,)) as pool:
+        futures = [pool.submit(_search_shard, grid, prefix, rest, lazorlist,
+                               holelist, position, order, rules) for prefix, rest in shards]
+        for future in as_completed(futures):
+            answer = future.result()
+            if answer is not None:
+                cancel.set()
+                for other in futures:
+                    other.cancel()
+                return answer
+
+
+def find_reachable(grid, A_num, B_num, C_num, lazorlist, holelist):
+    '''
+    This function follows the lazors as if every open cell could hold every
+    kind of block there is at the same time, so it finds every point a lazor
+    could reach and every cell it could meet on any board
+
+    **Parameters**
+
+        The same parameters as check_solvable
+
+    **Return**
+
+        reached: *set*
+            The (x, y) coordinations of the points a lazor could reach
+        touched: *set*
+            The (x, y) coordinations of the cells a lazor could meet
+    '''
+    open_num = sum(row.count('o') for row in grid)
+    kinds = [block for block, number in zip(['A', 'B', 'C'], [A_num, B_num, C_num])
+             if number > 0]
+    if A_num + B_num + C_num < open_num:
+        kinds.append('o')
+    table = TransitionTable(len(grid), len(grid[0]), holelist)
+    stack = [table.state(*lazor) for lazor in lazorlist]
+    seen = set()
+    reached = set()
+    touched = set()
+    while stack:
+        state = stack.pop()
+        if state in seen:
+            continue
+        seen.add(state)
+        reached.add(table.entries[state][:2])
+        cell_x = table.cell_x[state]
+        if cell_x < 0:
+            continue
+        touched.add((cell_x, table.cell_y[state]))
+        block = grid[table.cell_y[state]][cell_x]
+        for block in kinds if block == 'o' else [block]:
+            if block == 'A':
+                stack.append(table.bounce[state])
+            elif block == 'C':
+                stack.append(table.step[state])
+                stack.append(table.turn[state])
+            elif block != 'B':
+                stack.append(table.step[state])
+    return reached, touched
+
+
+def check_solvable(grid, A_num, B_num, C_num, lazorlist, holelist):
+    '''
+    This function proves some levels can not be solved before searching them,
+    a hole that is not among the points of find_reachable can never be reached.
+
+    **Parameters**
+
+        grid: *list*
+            The full grid in the form of a coordinate system
+        A_num: *int*
+            The number of A-block available
+        B_num: *int*
+            The number of B-block available
+        C_num: *int*
+            The number of C-block available
+        lazorlist: *list*
+            The first two elements is the positon of the start point, the last two elements are the direction.
+        holelist: *list*
+            The positions of the end points
+
+    **Return**
+
+        None, UnsolvableLevel is raised if the level can not be solved
+    '''
+    open_num = sum(row.count('o') for row in grid)
+    if A_num + B_num + C_num > open_num:
+        raise UnsolvableLevel('There are %d blocks but only %d open cells'
+                              % (A_num + B_num + C_num, open_num))
+    reached = find_reachable(grid, A_num, B_num, C_num, lazorlist, holelist)[0]
+    for hole in holelist:
+        if (hole[0], hole[1]) not in reached:
+            raise UnsolvableLevel('No lazor can reach the hole at (%d, %d)'
+                                  % (hole[0], hole[1]))
+
+
+def find_constraints(grid, A_num, B_num, C_num, lazorlist, holelist):
+    '''
+    This function works back from the holes to the blocks some open cells
+    must or must not hold. A lazor reaches a hole along one of the two
+    diagonal lines through it, so the moves of the lazors find_reachable
+    follows that bring one to the hole are all the ways to reach it. If they
+    all pass one cell, the cell can only hold the blocks those moves need,
+    and if they all come from one position and direction of a lazor, every
+    way to the hole goes through it, so the moves into it are followed back
+    the same way. The lazors are followed again with the blocks left until
+    nothing changes.
+
+    **Parameters**
+
+        The same parameters as check_solvable
+
+    **Return**
+
+        rules: *dict*
+            The blocks, and 'o' for none, each constrained open cell can hold.
+            UnsolvableLevel is raised if a hole can not be reached with them
+    '''
+    open_num = sum(row.count('o') for row in grid)
+    kinds = [block for block, number in zip(['A', 'B', 'C'], [A_num, B_num, C_num])
+             if number > 0]
+    if A_num + B_num + C_num < open_num:
+        kinds.append('o')
+    table = TransitionTable(len(grid), len(grid[0]), holelist)
+    starts = set(table.state(*lazor) for lazor in lazorlist)
+    rules = {}
+    changed = True
+    while changed:
+        # The moves into every state, and the moves counting every point
+        comes = {}
+        counts = {}
+        stack = list(starts)
+        seen = set()
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            cell_x = table.cell_x[state]
+            if cell_x < 0:
+                continue
+            cell = (cell_x, table.cell_y[state])
+            point = table.entries[state][:2]
+            block = grid[cell[1]][cell_x]
+            for block in rules.get(cell, kinds) if block == 'o' else [block]:
+                if block == 'A':
+                    moves = [table.bounce[state]]
+                elif block == 'C':
+                    moves = [table.step[state], table.turn[state]]
+                elif block == 'B':
+                    moves = []
+                else:
+                    moves = [table.step[state]]
+                # A lazor stopped or split at its start point counts it too
+                if state in starts and (block == 'B' or block == 'C'):
+                    counts.setdefault(point, []).append((state, cell, block))
+                for move in moves:
+                    comes.setdefault(move, []).append((state, cell, block))
+                    if table.entries[move][:2] != point:
+                        counts.setdefault(table.entries[move][:2], []).append(
+                            (state, cell, block))
+                    stack.append(move)
+        changed = False
+        for hole in holelist:
+            moves = counts.get((hole[0], hole[1]), [])
+            passed = set()
+            while True:
+                if len(moves) == 0:
+                    raise UnsolvableLevel('No lazor can reach the hole at (%d, %d)'
+                                          % (hole[0], hole[1]))
+                cells = set(cell for state, cell, block in moves)
+                x, y = cells.pop()
+                if len(cells) == 0 and grid[y][x] == 'o':
+                    allowed = rules.get((x, y), kinds)
+                    needed = [block for block in allowed
+                              if any(block == move[2] for move in moves)]
+                    if len(needed) < len(allowed):
+                        rules[(x, y)] = needed
+                        changed = True
+                states = set(state for state, cell, block in moves)
+                state = states.pop()
+                if len(states) > 0 or state in starts or state in passed:
+                    break
+                passed.add(state)
+                moves = comes[state]
+    # More cells needing a kind of block than there are blocks of it
+    for block, number in zip(['A', 'B', 'C'], [A_num, B_num, C_num]):
+        needing = sum(1 for allowed in rules.values() if allowed == [block])
+        if needing > number:
+            raise UnsolvableLevel('%d cells need a %s-block but there are %d'
+                                  % (needing, block, number))
+    return rules
+
+
+def find_path(grid, A_num, B_num, C_num, lazorlist, holelist, position, workers=1,
+              order='lex'):
+    '''
+    Generate a possible grid with blocks filled in and solves it, if it is the right grid, we return all the necessary parameters of the grid
+
+    **Parameters**
+
+        grid: *list*
+            The full grid in the form of a coordinate system
+        A_num: *int*
+            The number of A-block available
+        B_num: *int*
+            The number of B-block available
+        C_num: *int*
+            The number of C-block available
+        lazorlist: *list*
+            The first two elements is the positon of the start point, the last two elements are the direction.
+        holelist: *list*
+            The positions of the end points   
+        position: *list*
+            A list store the pre-placed blocks
+        workers: *int*
+            The number of processes searching at the same time
+        order: *str*
+            'lex' tries the permutations in reverse lexicographic order, 'gray'
+            in an order where every board differs from the one before in two
+            cells, so the lazor paths can be traced incrementally,
+            'combination' chooses the positions of every kind of block,
+            'surplus' does the same with fewer blocks first and puts the
+            ones left over where no lazor goes, 'jump' does the same as
+            'combination' with the lazors jumping from block to block,
+            'bitboard' does the same as 'combination' on BitBoard
+            candidates, and 'batch' traces chunks of them at once with numpy
+
+    **Return**
+
+        solution: *list*
+            The positions and directions laser passed
+        list_temp_save: *list*
+            One possible permutation of blocks
+        test_board: *list*
+            The full grid in coordination
+    '''
+    if order not in ORDERS:
+        raise ValueError('Unknown order %r, use one of %s' % (order, ', '.join(ORDERS)))
+    check_solvable(grid, A_num, B_num, C_num, lazorlist, holelist)
+    rules = find_constraints(grid, A_num, B_num, C_num, lazorlist, holelist)
+    groups = find_groups(grid, A_num, B_num, C_num, lazorlist, holelist)
+    if len(groups) > 1:
+        return find_path_groups(grid, A_num, B_num, C_num, groups, lazorlist, holelist,
+                                position, workers=workers, order=order)
+    # The open cells no lazor can meet on any board change nothing, so they
+    # are not searched over and only hold the blocks left over
+    touched = find_reachable(grid, A_num, B_num, C_num, lazorlist, holelist)[1]
+    board = Grid([row.copy() for row in grid])
+    cells = board.open_cells(position)
+    dead = [cell for cell in cells if cell not in touched]
+    fixed = position + [[y, x] for x, y in dead]
+    for A_park, B_park, C_park in gen_parkings([A_num, B_num, C_num], len(dead),
+                                               len(cells) - len(dead)):
+        # The parked blocks are taken back out before the next parking is
+        # tried, the searches work on copies of the board they are given
+        parked = ['A'] * A_park + ['B'] * B_park + ['C'] * C_park
+        board.apply(dead, parked)
+        # Wxtract the blank positions and replace them with blocks
+        Blocks = ['o'] * (len(cells) - len(dead))
+        A_live = A_num - A_park
+        B_live = B_num - B_park
+        C_live = C_num - C_park
+        for i in range(A_live):
+            Blocks[i] = 'A'
+        for i in range(A_live, (A_live + B_live)):
+            Blocks[i] = 'B'
+        for i in range((A_live + B_live), (A_live + B_live + C_live)):
+            Blocks[i] = 'C'
+        if workers > 1:
+            found = find_path_parallel(board.origrid, Blocks, lazorlist, holelist, fixed,
+                                       workers, order=order, rules=rules)
+        else:
+            found = search_placements(board.origrid, [], Blocks, lazorlist, holelist, fixed,
+                                      order=order, rules=rules)
+        board.revert()
+        if found is not None:
+            solution, list_temp_save, test_board = found
+            list_temp_save = [test_board[y][x] for x, y in cells]
+            return solution, list_temp_save, test_board
+
+
+def find_groups(grid, A_num, B_num, C_num, lazorlist, holelist):
+    '''
+    This function splits the lazors into groups that can never meet the same
+    cell or reach the same hole on any board, so the blocks of one group never
+    change the paths of another
+
+    **Parameters**
+
+        The same parameters as check_solvable
+
+    **Return**
+
+        groups: *list*
+            For every group a tuple of its lazors, the holes they can reach
+            and the open cells they can meet
+    '''
+    holes = set((hole[0], hole[1]) for hole in holelist)
+    groups = []
+    for lazor in lazorlist:
+        reached, touched = find_reachable(grid, A_num, B_num, C_num, [lazor], holelist)
+        lazors = [lazor]
+        reached = reached & holes
+        cells = set((x, y) for x, y in touched if grid[y][x] == 'o')
+        # Join every group that shares a cell or a hole with this lazor
+        for group in groups[:]:
+            if group[1] & reached or group[2] & cells:
+                groups.remove(group)
+                lazors = group[0] + lazors
+                reached |= group[1]
+                cells |= group[2]
+        groups.append((lazors, reached, cells))
+    # Keep the lazors and holes in the order they were given
+    return [([lazor for lazor in lazorlist if lazor in lazors],
+             [hole for hole in holelist if (hole[0], hole[1]) in reached], cells)
+            for lazors, reached, cells in groups]
+
+
+def find_path_groups(grid, A_num, B_num, C_num, groups, lazorlist, holelist, position,
+                     workers=1, order='lex'):
+    '''
+    Solve every group of find_groups on its own with a share of the blocks,
+    and put the boards together. Each group is solved at most once for every
+    share, so the searches add up instead of multiplying.
+
+    **Parameters**
+
+        The same parameters as find_path, and
+
+        groups: *list*
+            The groups from find_groups
+
+    **Return**
+
+        The same parameters as find_path
+    '''
+    cells = Grid(grid).open_cells(position)
+    # A group without holes needs no blocks, so the blocks no group gets are
+    # parked in its cells and the ones no lazor can meet
+    groups = [group for group in groups if group[1]]
+    dead = [cell for cell in cells if not any(cell in group[2] for group in groups)]
+    solved = {}
+
+    def solve(i, share):
+        if (i, share) not in solved:
+            lazors, holes, group_cells = groups[i]
+            # The cells of the other groups are closed, its lazors never meet them
+            subgrid = [row.copy() for row in grid]
+            for x, y in cells:
+                if (x, y) not in group_cells:
+                    subgrid[y][x] = 'x'
+            try:
+                solved[(i, share)] = find_path(subgrid, share[0], share[1], share[2], lazors,
+                                               holes, position, workers=workers, order=order)
+            except UnsolvableLevel:
+                solved[(i, share)] = None
+        return solved[(i, share)]
+
+    def split(i, left):
+        if i == len(groups):
+            return [] if sum(left) <= len(dead) else None
+        size = len(groups[i][2])
+        room = len(dead) + sum(len(group[2]) for group in groups[i + 1:])
+        for share in product(*[range(min(number, size), -1, -1) for number in left]):
+            rest = tuple(number - part for number, part in zip(left, share))
+            if sum(share) > size or sum(rest) > room:
+                continue
+            found = solve(i, share)
+            if found is None:
+                continue
+            others = split(i + 1, rest)
+            if others is not None:
+                return [found] + others
+        return None
+
+    found = split(0, (A_num, B_num, C_num))
+    if found is None:
+        return None
+    board = [row.copy() for row in grid]
+    for (lazors, holes, group_cells), (solution, list_temp, group_board) in zip(groups, found):
+        for x, y in group_cells:
+            board[y][x] = group_board[y][x]
+    leftover = []
+    for block, number in zip(['A', 'B', 'C'], [A_num, B_num, C_num]):
+        leftover += [block] * (number - sum(row.count(block) for row in board) +
+                               sum(row.count(block) for row in grid))
+    for (x, y), block in zip(dead, leftover + ['o'] * (len(dead) - len(leftover))):
+        board[y][x] = block
+    solution = Lazor(board, lazorlist, holelist).lazor_path()
+    list_temp_save = [board[y][x] for x, y in cells]
+    return solution, list_temp_save, board
+
+
+def gen_parkings(counts, dead_num, live_num):
+    '''
+    This function finds the ways to park the blocks in the cells no lazor can
+    meet, the ways parking the most blocks come first since they leave the
+    fewest blocks to search over
+
+    **Parameters**
+
+        counts: *list*
+            The numbers of 'A', 'B' and 'C' blocks
+        dead_num: *int*
+            The number of cells no lazor can meet
+        live_num: *int*
+            The number of the other open cells
+
+    **Return**
+
+        parkings: *list*
+            The numbers of 'A', 'B' and 'C' blocks parked
+    '''
+    parkings = []
+    for A_park in range(min(counts[0], dead_num) + 1):
+        for B_park in range(min(counts[1], dead_num - A_park) + 1):
+            for C_park in range(min(counts[2], dead_num - A_park - B_park) + 1):
+                if sum(counts) - A_park - B_park - C_park <= live_num:
+                    parkings.append((A_park, B_park, C_park))
+    parkings.sort(key=sum, reverse=True)
+    return parkings
+
+
+class TranspositionTable(object):
+    '''
+    This Function class remembers the keys of the boards a search has found
+    no solution below, so when the search comes to the same position again
+    in another order it does not search it again
+
+    **Parameters**
+
+        capacity: *int*
+            The most keys kept, the one used least recently is forgotten first
+    '''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.keys = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def seen(self, key):
+        '''
+        This function checks if a key has been remembered, and counts the
+        hits and misses
+        '''
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key):
+        '''
+        This function remembers a key
+        '''
+        self.keys[key] = None
+        if len(self.keys) > self.capacity:
+            self.keys.popitem(last=False)
+
+
+class PathSearch(object):
+    '''
+    This Function class is a wrapper for a backtracking search that only places
+    blocks on the cells the lazors actually reach. The lazors are traced on a
+    partly filled board, and each time a lazor reaches an open cell that has
+    not been decided yet, the search branches on leaving it empty or putting
+    an 'A', 'B' or 'C' block there.
+
+    **Parameters**
+
+        grid: *list*
+            The full grid in the form of a coordinate system
+        A_num: *int*
+            The number of A-block available
+        B_num: *int*
+            The number of B-block available
+        C_num: *int*
+            The number of C-block available
+        lazorlist: *list*
+            The first two elements is the positon of the start point, the last two elements are the direction.
+        holelist: *list*
+            The positions of the end points
+        position: *list*
+            A list store the pre-placed blocks
+        backjump: *bool*
+            When a branch fails, find the cells that made it fail and go
+            straight back to the last of them, and remember them so the same
+            failure is not searched again
+        capacity: *int*
+            The most failures remembered when backjump is True
+        transpositions: *int*
+            The most positions the TranspositionTable keeps, 0 searches
+            without one
+        rules: *dict*
+            The blocks the open cells can hold from find_constraints, the
+            others are never tried in them
+    '''
+
+    def __init__(self, grid, A_num, B_num, C_num, lazorlist, holelist, position,
+                 backjump=False, capacity=10000, transpositions=0, rules=None):
+        self.board = [row.copy() for row in grid]
+        self.length = len(grid)
+        self.width = len(grid[0])
+        self.lazorlist = lazorlist
+        self.holelist = holelist
+        self.holes = set((hole[0], hole[1]) for hole in holelist)
+        self.remaining = {'A': A_num, 'B': B_num, 'C': C_num}
+        # The open cells in the same order Grid.gen_grid fills them, the
+        # undecided ones hold '?' so failures are never matched on them
+        self.open_cells = Grid(grid).open_cells(position)
+        for x, y in self.open_cells:
+            self.board[y][x] = '?'
+        self.undecided = set(self.open_cells)
+        self.rules = rules or {}
+        self.nodes = 0
+        self.backjump = backjump
+        self.nogoods = NogoodStore(self.open_cells, capacity)
+        self.index = LineIndex(grid, holelist)
+        # The rays explore has gone along, see segment
+        self.segments = {}
+        self.transpositions = None
+        if transpositions:
+            self.transpositions = TranspositionTable(transpositions)
+        # The cells in the order they were decided
+        self.trail = []
+        # The cells the lazors met in the last trace, and the lazors waiting
+        # at undecided cells
+        self.touched = set()
+        self.heads = []
+
+    def trace(self):
+        '''
+        This function traces the lazors on the partly filled board until every
+        lazor has left the grid, been absorbed, come back to a state it has
+        already been in, or reached an undecided cell. The lazors jump along
+        the LineIndex from one open cell or fixed block to the next, a loop
+        always turns at a block so it is still found at them.
+
+        **Parameters**
+
+            None
+
+        **Return**
+
+            covered: *set*
+                The holes the lazors have passed
+            frontier: *tuple*
+                The first undecided cell a lazor reaches, None if there is none
+        '''
+        board = self.board
+        undecided = self.undecided
+        holes = self.holes
+        jumps = self.index.jumps
+        jump = self.index.jump
+        covered = set()
+        visited = set()
+        touched = self.touched = set()
+        heads = self.heads = []
+        frontier = None
+        beams = [tuple(lazor) for lazor in self.lazorlist]
+        while beams:
+            x, y, dx, dy = beams.pop()
+            while True:
+                stop, passed = jumps.get((x, y, dx, dy)) or jump(x, y, dx, dy)
+                if passed:
+                    covered.update(passed)
+                if stop is None:
+                    break
+                # The cell the lazor is about to pass
+                x, y, cell = stop[0], stop[1], stop[2]
+                if (x, y, dx, dy) in visited:
+                    break
+                visited.add((x, y, dx, dy))
+                if cell in undecided:
+                    if frontier is None:
+                        frontier = cell
+                    heads.append((x, y, dx, dy))
+                    break
+                touched.add(cell)
+                block_type = board[cell[1]][cell[0]]
+                if block_type == 'B':
+                    if (x, y) in holes:
+                        covered.add((x, y))
+                    break
+                if block_type == 'A' or block_type == 'C':
+                    if block_type == 'C':
+                        if (x + dx, y + dy, dx, dy) not in visited:
+                            beams.append((x + dx, y + dy, dx, dy))
+                        if (x + dx, y + dy) in holes:
+                            covered.add((x + dx, y + dy))
+                        if (x, y) in holes:
+                            covered.add((x, y))
+                    if x & 1 == 0:
+                        dx = -dx
+                    else:
+                        dy = -dy
+                    if block_type == 'C':
+                        continue
+                x, y = x + dx, y + dy
+                if (x, y) in holes:
+                    covered.add((x, y))
+        return covered, frontier
+
+    def complete(self):
+        '''
+        This function puts the blocks left over into the undecided cells, which
+        no lazor reaches, and checks the board with Lazor
+
+        **Parameters**
+
+            None
+
+        **Return**
+
+            tuple: *list, list, list*
+                The lazor path, the permutation of blocks and the board,
+                None if the board does not pass the check
+        '''
+        leftover = []
+        for block in ['A', 'B', 'C']:
+            leftover += [block] * self.remaining[block]
+        spare = [cell for cell in self.open_cells if cell in self.undecided]
+        for (x, y), block in zip(spare, leftover + ['o'] * (len(spare) - len(leftover))):
+            self.board[y][x] = block
+        test_board = [row.copy() for row in self.board]
+        for x, y in spare:
+            self.board[y][x] = '?'
+        solution = Lazor(test_board, self.lazorlist, self.holelist).lazor_path()
+        if solution == 0:
+            return None
+        list_temp = [test_board[y][x] for x, y in self.open_cells]
+        return solution, list_temp, test_board
+
+    def search(self):
+        '''
+        This function runs the backtracking search
+
+        **Parameters**
+
+            None
+
+        **Yield**
+
+            tuple: *list, list, list*
+                The lazor path, the permutation of blocks and the board of
+                every solution found
+        '''
+        self.nodes += 1
+        covered, frontier = self.trace()
+        if frontier is None:
+            if len(covered) == len(self.holes):
+                answer = self.complete()
+                if answer is not None:
+                    yield answer
+            return
+        if self.transpositions is not None:
+            key = self.position_key(covered)
+            if self.transpositions.seen(key):
+                return
+        found = False
+        x, y = frontier
+        self.undecided.remove(frontier)
+        for block in self.rules.get(frontier, ['A', 'B', 'C', 'o']):
+            if block == 'o':
+                # Keep enough undecided cells for the blocks left over
+                if len(self.undecided) < sum(self.remaining.values()):
+                    continue
+            elif self.remaining[block] == 0:
+                continue
+            else:
+                self.remaining[block] -= 1
+            self.board[y][x] = block
+            for answer in self.search():
+                found = True
+                yield answer
+            self.board[y][x] = '?'
+            if block != 'o':
+                self.remaining[block] += 1
+        self.undecided.add(frontier)
+        if self.transpositions is not None and not found:
+            self.transpositions.add(key)
+
+    def search_backjump(self):
+        '''
+        This function runs the backtracking search with backjumping. A branch
+        that fails returns the decided cells the failure comes from, every
+        board holding the same blocks in them fails too. So when the cell
+        just decided is not among them, trying its other blocks can not help
+        and the search goes back further at once.
+
+        **Parameters**
+
+            None
+
+        **Return**
+
+            answer: *tuple*
+                The lazor path, the permutation of blocks and the board, None
+                if there is no solution below this point
+            conflict: *set*
+                The decided cells the failure comes from, None if an answer
+                is found
+        '''
+        self.nodes += 1
+        if self.nogoods.match(self.board):
+            return None, set((x, y) for x, y, block in self.nogoods.hit)
+        conflict = self.unreachable()
+        if conflict is not None:
+            self.nogoods.add(self.board, conflict)
+            return None, conflict
+        covered, frontier = self.trace()
+        if frontier is None:
+            if len(covered) == len(self.holes):
+                answer = self.complete()
+                if answer is not None:
+                    return answer, None
+                conflict = set(cell for cell in self.open_cells if cell not in self.undecided)
+            else:
+                # Every board with the same blocks in the cells the lazors met
+                # sends them along the same paths
+                conflict = set(cell for cell in self.touched if cell in self.nogoods.order)
+            self.nogoods.add(self.board, conflict)
+            return None, conflict
+        if self.transpositions is not None:
+            key = self.position_key(covered)
+            # The position is not kept with its cause, so every decided
+            # cell takes the blame
+            if self.transpositions.seen(key):
+                return None, set(cell for cell in self.open_cells
+                                 if cell not in self.undecided)
+        x, y = frontier
+        self.undecided.remove(frontier)
+        conflict = set()
+        # The blocks the rules keep out of the cell are left out on every
+        # board, so they add no cells to blame
+        for block in self.rules.get(frontier, ['A', 'B', 'C', 'o']):
+            if block == 'o':
+                # Keep enough undecided cells for the blocks left over, how
+                # many are left only depends on the cells left empty
+                if len(self.undecided) < sum(self.remaining.values()):
+                    conflict |= self.decided('o')
+                    continue
+            elif self.remaining[block] == 0:
+                conflict |= self.decided(block)
+                continue
+            else:
+                self.remaining[block] -= 1
+            self.board[y][x] = block
+            self.trail.append(frontier)
+            answer, below = self.search_backjump()
+            self.trail.pop()
+            self.board[y][x] = '?'
+            if block != 'o':
+                self.remaining[block] += 1
+            if answer is not None:
+                self.undecided.add(frontier)
+                return answer, None
+            if frontier not in below:
+                self.undecided.add(frontier)
+                if self.transpositions is not None:
+                    self.transpositions.add(key)
+                return None, below
+            conflict |= below
+        conflict.discard(frontier)
+        self.undecided.add(frontier)
+        self.nogoods.add(self.board, conflict)
+        if self.transpositions is not None:
+            self.transpositions.add(key)
+        return None, conflict
+
+    def unreachable(self):
+        '''
+        This function checks if a hole can no longer be reached, whatever is
+        put in the undecided cells. If so, the decided cells are freed one by
+        one from the last decided, and the ones the hole stays out of reach
+        without are left out, so only a few cells are left to blame.
+
+        **Parameters**
+
+            None
+
+        **Return**
+
+            conflict: *set*
+                The decided cells that keep a hole from being reached, None
+                if every hole could still be reached
+        '''
+        kinds = self.kinds()
+        touched = self.reach(kinds, self.undecided)
+        if touched is None:
+            return None
+        # The blocks the undecided cells can not hold any more are used up by
+        # the decided cells holding them, so those cells always take part
+        used_up = set()
+        for block in ['A', 'B', 'C', 'o']:
+            if block not in kinds:
+                used_up |= self.decided(block)
+        free = set(self.undecided)
+        for cell in reversed(self.trail):
+            if cell in touched and cell not in used_up:
+                free.add(cell)
+                still = self.reach(kinds, free)
+                if still is None:
+                    free.discard(cell)
+                else:
+                    touched = still
+        return touched | used_up
+
+    def reach(self, kinds, free):
+        '''
+        This function does what find_reachable does on the partly filled
+        board, the cells in free can hold any of kinds
+
+        **Parameters**
+
+            kinds: *list*
+                The blocks the free cells can hold
+            free: *set*
+                The cells whose blocks are not known
+
+        **Return**
+
+            touched: *set*
+                The other open cells the lazors could meet, None if every
+                hole could be reached
+        '''
+        starts = [tuple(lazor) for lazor in self.lazorlist]
+        reached, met = self.explore(starts, kinds, free)
+        if self.holes <= reached:
+            return None
+        return met - free
+
+    def explore(self, starts, kinds, free):
+        '''
+        This function follows the lazors from some positions and directions,
+        going every way a block the free cells can hold could send them. The
+        lazors go along the rays of the LineIndex, so only the points they
+        meet a cell at are looked at.
+
+        **Parameters**
+
+            starts: *list*
+                The positions and directions to start from
+            kinds: *list*
+                The blocks the free cells can hold
+            free: *set*
+                The cells whose blocks are not known
+
+        **Return**
+
+            reached: *set*
+                The holes the lazors could reach
+            met: *set*
+                The open cells the lazors could meet
+        '''
+        board = self.board
+        order = self.nogoods.order
+        rules = self.rules
+        segments = self.segments
+        stack = list(starts)
+        seen = set()
+        reached = set()
+        met = set()
+        while stack:
+            start = stack.pop()
+            if start in seen:
+                continue
+            seen.add(start)
+            segment = segments.get(start) or self.segment(*start)
+            dx, dy = start[2], start[3]
+            i = 0
+            for x, y, cell, turn in segment[0]:
+                # From a stop some lazor has been at on, the way on is
+                # already followed
+                if (x, y, dx, dy) in seen and i > 0:
+                    break
+                seen.add((x, y, dx, dy))
+                if cell in order:
+                    met.add(cell)
+                if cell in free:
+                    blocks = kinds
+                    if cell in rules:
+                        blocks = [block for block in kinds if block in rules[cell]]
+                else:
+                    blocks = [board[cell[1]][cell[0]]]
+                if 'A' in blocks:
+                    stack.append((x + turn[0], y + turn[1]) + turn)
+                if 'C' in blocks:
+                    stack.append((x + dx, y + dy, dx, dy))
+                    stack.append((x, y) + turn)
+                if 'o' not in blocks:
+                    break
+                i += 1
+            else:
+                if segment[2] is not None:
+                    stack.append(segment[2])
+            reached.update(segment[1][i])
+        return reached, met
+
+    def segment(self, x, y, dx, dy):
+        '''
+        This function looks up the ray of the LineIndex a lazor goes along
+        from (x, y) for explore, and keeps it for the next time
+
+        **Parameters**
+
+            x, y, dx, dy: *int*
+                The position and direction of the lazor
+
+        **Return**
+
+            segment: *tuple*
+                The point, the cell and the direction the lazor turns to for
+                every cell it meets until the first fixed block, the holes
+                reached when it stops at each of them and when it goes on
+                past them all, and where it goes on from past a fixed block
+                that does not stop it, None if there is none
+        '''
+        stops, fixed = self.index.ray(x, y, dx, dy)[1:]
+        beyond = None
+        if fixed is not None:
+            if fixed[3] in ['A', 'B', 'C']:
+                stops = stops + [fixed]
+            else:
+                beyond = (fixed[0] + dx, fixed[1] + dy, dx, dy)
+        turns = []
+        holes = []
+        for stop in stops:
+            if stop[0] & 1 == 0:
+                turns.append(stop[:3] + ((-dx, dy),))
+            else:
+                turns.append(stop[:3] + ((dx, -dy),))
+            holes.append(self.index.holes_between(x, y, dx, dy, stop))
+        holes.append(self.index.holes_between(x, y, dx, dy, fixed))
+        for passed in holes:
+            if (x, y) in self.holes:
+                passed.append((x, y))
+        segment = self.segments[(x, y, dx, dy)] = turns, holes, beyond
+        return segment
+
+    def kinds(self):
+        '''
+        This function returns the blocks the undecided cells can still hold
+        '''
+        kinds = [block for block in ['A', 'B', 'C'] if self.remaining[block] > 0]
+        if len(self.undecided) > sum(self.remaining.values()):
+            kinds.append('o')
+        return kinds
+
+    def position_key(self, covered):
+        '''
+        This function describes everything the search below the current
+        board depends on. The holes the finished board covers are the ones
+        the lazors reach until they meet the undecided cells, and the ones
+        they reach from there, which only depends on the cells they could
+        meet from there. So boards with the same lazors waiting at undecided
+        cells, the same holes covered, the same blocks left and the same
+        blocks in those cells are solved the same way.
+
+        **Parameters**
+
+            covered: *set*
+                The holes the lazors have passed
+
+        **Return**
+
+            key: *tuple*
+                The key of the board in the TranspositionTable
+        '''
+        met = self.explore(self.heads, self.kinds(), self.undecided)[1]
+        return (frozenset(self.heads), frozenset(covered),
+                tuple(self.remaining[block] for block in ['A', 'B', 'C']),
+                len(self.undecided),
+                tuple(sorted((x, y, self.board[y][x]) for x, y in met)))
+
+    def decided(self, block):
+        '''
+        This function finds the decided cells holding a kind of block
+        '''
+        return set((x, y) for x, y in self.open_cells
+                   if (x, y) not in self.undecided and self.board[y][x] == block)
+
+    def solve(self):
+        '''
+        This function runs the search and returns the first solution, or None
+        '''
+        if self.backjump:
+            return self.search_backjump()[0]
+        for answer in self.search():
+            return answer
+
+
+def find_path_guided(grid, A_num, B_num, C_num, lazorlist, holelist, position,
+                     backjump=False, transpositions=0, stats=None):
+    '''
+    Solve the grid with the path guided search instead of trying every
+    permutation of blocks, it returns the same parameters as find_path
+
+    **Parameters**
+
+        grid: *list*
+            The full grid in the form of a coordinate system
+        A_num: *int*
+            The number of A-block available
+        B_num: *int*
+            The number of B-block available
+        C_num: *int*
+            The number of C-block available
+        lazorlist: *list*
+            The first two elements is the positon of the start point, the last two elements are the direction.
+        holelist: *list*
+            The positions of the end points
+        position: *list*
+            A list store the pre-placed blocks
+        backjump: *bool*
+            Search with backjumping, see PathSearch.search_backjump
+        transpositions: *int*
+            The most positions the TranspositionTable of the search keeps
+        stats: *dict*
+            If given, the number of nodes searched and the hits and misses
+            of the TranspositionTable are put in it as 'nodes', 'hits' and
+            'misses'
+
+    **Return**
+
+        solution: *list*
+            The positions and directions laser passed
+        list_temp_save: *list*
+            One possible permutation of blocks
+        test_board: *list*
+            The full grid in coordination
+    '''
+    check_solvable(grid, A_num, B_num, C_num, lazorlist, holelist)
+    rules = find_constraints(grid, A_num, B_num, C_num, lazorlist, holelist)
+    search = PathSearch(grid, A_num, B_num, C_num, lazorlist, holelist, position,
+                        backjump=backjump, transpositions=transpositions, rules=rules)
+    found = search.solve()
+    if stats is not None:
+        stats['nodes'] = search.nodes
+        if search.transpositions is None:
+            stats['hits'] = stats['misses'] = 0
+        else:
+            stats['hits'] = search.transpositions.hits
+            stats['misses'] = search.transpositions.misses
+    return found
+
+
+def find_fixed_block(smallgrid):
+    '''
+    This function looks for blocks that were in the original board 
+    so that we wouldn't replace it when generating grids
+
+    **Parameters**
+
+        smallgrid: *list*
+            This is the orignial grid provided by the .bff file
+
+    **Return**
+
+        position: *list*
+            The coordination of the fixed blocks provided by the game
+    '''
+    position = []
+    for i in range(len(smallgrid)):
+        for j in range(len(smallgrid[0])):
+            block = smallgrid[i][j]
+            if block == 'A' or block == 'B' or block == 'C':
+                position.append([i*2+1, j*2+1])
+    return position
+
+
+def benchmark_trace(fptr, number=1000):
+    '''
+    This function traces the first boards of a level with Lazor and with
+    TraceCore, and measures the time and the memory every trace allocates
+    with tracemalloc
+
+    **Parameters**
+
+        fptr: *str*
+            This is the .bff file name you want to run.
+        number: *int*
+            The number of boards traced
+
+    **Return**
+
+        results: *dict*
+            For 'lazor' and 'core', the seconds all the traces take and the
+            bytes a trace allocates on average at its peak
+    '''
+    grid, a, b, c, lazorlist, holelist, smallgrid = read_bff(fptr)
+    cells = Grid(grid).open_cells(find_fixed_block(smallgrid))
+    blocks = ['A'] * a + ['B'] * b + ['C'] * c + ['o'] * (len(cells) - a - b - c)
+    boards = []
+    for list_temp in islice(gen_permutations(blocks), number):
+        board = [row.copy() for row in grid]
+        for (x, y), block in zip(cells, list_temp):
+            board[y][x] = block
+        boards.append(board)
+    table = TransitionTable(len(grid), len(grid[0]), holelist)
+    core = TraceCore(table, grid, lazorlist)
+    goal = (1 << len(holelist)) - 1
+
+    def trace_lazor(board):
+        return Lazor(board, lazorlist, holelist, table).lazor_path(solve=True)
+
+    def trace_core(board):
+        for x, y in cells:
+            core.place(x, y, board[y][x])
+        return core.trace(goal) == goal
+
+    results = {}
+    for name, trace in [('lazor', trace_lazor), ('core', trace_core)]:
+        t0 = time.time()
+        for board in boards:
+            trace(board)
+        seconds = time.time() - t0
+        tracemalloc.start()
+        peak = 0
+        for board in boards:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            trace(board)
+            peak += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        results[name] = (seconds, peak / len(boards))
+    return results
+
+
+def solver(fptr, method='brute', workers=1, transpositions=0, stats=None):
     '''
     This function provides all the necessary parameters of the correct grid 
     and generates a picture of the result 
@@ -654,6 +3944,20 @@ def solver(fptr):
 
         fptr: *str*
             This is the .bff file name you want to run.
+        method: *str*
+            'brute' tries every permutation of blocks,
+            'guided' only places blocks where the lazors go,
+            'backjump' does the same and jumps back over the blocks a
+            failure does not depend on
+        workers: *int*
+            The number of processes the 'brute' method searches with, the
+            other methods only search with one
+        transpositions: *int*
+            The most positions the 'guided' and 'backjump' methods remember
+            in a TranspositionTable, 0 for none
+        stats: *dict*
+            If given, the 'guided' and 'backjump' methods put the nodes they
+            searched and the hits and misses of the TranspositionTable in it
 
     **Return**
 
@@ -665,6 +3969,14 @@ def solver(fptr):
             The correct grid but every element in one list
     '''
 
+    if method not in ['brute', 'guided', 'backjump']:
+        raise ValueError("Unknown method %r, use 'brute', 'guided' or 'backjump'" % method)
+    if method != 'brute' and workers > 1:
+        raise ValueError("The %r method searches with one process, only 'brute' "
+                         "takes more workers" % method)
+    if method == 'brute' and (transpositions or stats is not None):
+        raise ValueError("The 'brute' method keeps no TranspositionTable or stats, "
+                         "use 'guided' or 'backjump'")
     # We read the .bff file and obatin the grid that we filled with 'x' for coordination,
     # the number of a,b,c, the original lasor list, the hole list and the original grid
     read = read_bff(fptr)
@@ -678,14 +3990,22 @@ def solver(fptr):
     # We find out the coordination of blocks that are fixed
     position = find_fixed_block(smallgrid)
     # We find out the lasor pathway and permutation of the correct grid
-    answer, lazor = find_path(grid, a, b, c, lazorlist, holelist, position)[:2]
+    if method == 'guided' or method == 'backjump':
+        found = find_path_guided(grid, a, b, c, lazorlist, holelist, position,
+                                 backjump=method == 'backjump',
+                                 transpositions=transpositions, stats=stats)
+    else:
+        found = find_path(grid, a, b, c, lazorlist, holelist, position, workers=workers)
+    if found is None:
+        raise UnsolvableLevel('No arrangement of the blocks solves %s' % fptr)
+    answer, lazor = found[:2]
     # We generate the orignial board filled with the correct lazor path
-    good_list = copy.deepcopy(lazor)
-    good_grid = copy.deepcopy(smallgrid)
+    good_list = iter(lazor)
+    good_grid = [row.copy() for row in smallgrid]
     for row in range(len(good_grid)):
         for column in range(len(good_grid[0])):
             if good_grid[row][column] == 'o':
-                good_grid[row][column] = good_list.pop(0)
+                good_grid[row][column] = next(good_list)
     # We save and generate a picture for the solve
     save_answer_board(solved_board=good_grid, answer_lazor=answer, lazors_info=lazorlist,
                       holes=holelist, filename=fptr)
@@ -91,6 +91,460 @@ class TestStringMethods(unittest.TestCase):
                 ['A', 'o', 'o', 'o'], ['o', 'o', 'o', 'o']]
         self.assertEqual(lazor_project_final.solver('mad_1.bff')[0], answ)
 
+    def test_stream(self):
+        '''
+        This function can test the streamed permutations of blocks
+        '''
+        permu = [['o', 'o', 'A', 'A'], ['o', 'A', 'o', 'A'], ['o', 'A', 'A', 'o'],
+                 ['A', 'o', 'o', 'A'], ['A', 'o', 'A', 'o'], ['A', 'A', 'o', 'o']]
+        stream = lazor_project_final.gen_permutations(['A', 'A', 'o', 'o'])
+        self.assertEqual(next(stream), permu[0])
+        self.assertEqual([permu[0]] + list(stream), permu)
+
+    def test_guided(self):
+        '''
+        This function can test the path guided search
+        '''
+        answ = [['o', 'o', 'C', 'o'], ['o', 'o', 'o', 'A'],
+                ['A', 'o', 'o', 'o'], ['o', 'o', 'o', 'o']]
+        self.assertEqual(lazor_project_final.solver(
+            'mad_1.bff', method='guided')[0], answ)
+        with self.assertRaises(ValueError):
+            lazor_project_final.solver('mad_1.bff', method='guide')
+        with self.assertRaises(ValueError):
+            lazor_project_final.solver('mad_1.bff', method='guided', workers=2)
+
+    def test_parallel(self):
+        '''
+        This function can test the parallel search
+        '''
+        answ = [['o', 'o', 'C', 'o'], ['o', 'o', 'o', 'A'],
+                ['A', 'o', 'o', 'o'], ['o', 'o', 'o', 'o']]
+        self.assertEqual(lazor_project_final.solver(
+            'mad_1.bff', workers=2)[0], answ)
+
+    def test_incremental(self):
+        '''
+        This function can test the incremental trace against a full trace
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        lazor = lazor_project_final.IncrementalLazor(grid, lazorlist, holelist)
+        self.assertEqual(lazor.lazor_path(), 0)
+        for x, y, block in [(5, 1, 'C'), (7, 3, 'A'), (1, 5, 'A'), (7, 3, 'o'), (3, 3, 'A')]:
+            grid[y][x] = block
+            full = lazor_project_final.IncrementalLazor(grid, lazorlist, holelist)
+            full.lazor_path()
+            lazor.update([(x, y)])
+            self.assertEqual(lazor.paths, full.paths)
+
+    def test_gray(self):
+        '''
+        This function can test the minimal change order of blocks
+        '''
+        blocks = ['A', 'A', 'B', 'C', 'o', 'o']
+        permu = list(lazor_project_final.gen_permutations(blocks))
+        gray = list(lazor_project_final.gen_minimal_change(blocks))
+        self.assertEqual(sorted(permutation for permutation, swap in gray), sorted(permu))
+        for (before, swap_before), (after, swap) in zip(gray, gray[1:]):
+            i, j = swap
+            before[i], before[j] = before[j], before[i]
+            self.assertEqual(before, after)
+
+    def test_combination(self):
+        '''
+        This function can test the search choosing positions of blocks
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        permu = ['o', 'o', 'C', 'o', 'o', 'o', 'o',
+                 'A', 'A', 'o', 'o', 'o', 'o', 'o', 'o', 'o']
+        self.assertEqual(lazor_project_final.find_path(
+            grid, a, b, c, lazorlist, holelist, [], order='combination')[1], permu)
+        self.assertEqual(len(list(lazor_project_final.gen_combinations(
+            ['A', 'A', 'B', 'C', 'o', 'o']))), 180)
+
+    def test_loop(self):
+        '''
+        This function can test a lazor going round in a circle and a lazor
+        path longer than the grid of mad_1
+        '''
+        grid = [['x'] * 7 for i in range(7)]
+        for y in [1, 3, 5]:
+            for x in [1, 3, 5]:
+                grid[y][x] = 'A'
+        grid[3][3] = 'o'
+        lazor_path = [[[3, 2, 1, 1], [4, 3, 1, 1], [3, 4, -1, 1], [2, 3, -1, -1],
+                       [3, 2, 1, -1], [4, 3, 1, 1]]]
+        self.assertEqual(lazor_project_final.Lazor(
+            grid, [[3, 2, 1, 1]], [[2, 3]]).lazor_path(), lazor_path)
+        grid = [['o'] * 41 for i in range(41)]
+        self.assertEqual(len(lazor_project_final.Lazor(
+            grid, [[0, 0, 1, 1]], [[40, 40]]).lazor_path()[0]), 41)
+
+    def test_split(self):
+        '''
+        This function can test a lazor split off by a 'C' block where another
+        lazor has already been, which is not followed again
+        '''
+        grid = [['x'] * 7 for i in range(7)]
+        for x, y, block in [(3, 1, 'C'), (1, 3, 'A'), (3, 3, 'C'), (5, 3, 'C'), (3, 5, 'A')]:
+            grid[y][x] = block
+        paths = lazor_project_final.Lazor(grid, [[4, 3, 1, 1]], [[6, 5]]).lazor_path()
+        self.assertEqual([path[0] for path in paths],
+                         [[4, 3, 1, 1], [5, 4, 1, 1], [3, 4, -1, 1], [4, 1, 1, -1]])
+
+    def test_solve_mode(self):
+        '''
+        This function can test the lazor stopping early in solve mode
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        self.assertFalse(lazor_project_final.Lazor(
+            grid, lazorlist, holelist).lazor_path(solve=True))
+        grid[1][5] = 'C'
+        grid[3][7] = 'A'
+        grid[5][1] = 'A'
+        self.assertTrue(lazor_project_final.Lazor(
+            grid, lazorlist, holelist).lazor_path(solve=True))
+
+    def test_bitboard(self):
+        '''
+        This function can test the lazor and obvs_judge on a BitBoard
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        grid[1][5] = 'C'
+        grid[3][7] = 'A'
+        grid[5][1] = 'A'
+        board = lazor_project_final.BitBoard.from_grid(grid, holelist)
+        self.assertEqual(board.to_grid(), grid)
+        self.assertEqual(board.trace(lazorlist), board.hole_mask)
+        self.assertTrue(lazor_project_final.obvs_judge(board, None, None, holelist))
+        self.assertEqual(lazor_project_final.Lazor(board, lazorlist, holelist).lazor_path(),
+                         lazor_project_final.Lazor(grid, lazorlist, holelist).lazor_path())
+
+    def test_table(self):
+        '''
+        This function can test the lazor moved by a TransitionTable
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        grid[1][5] = 'C'
+        grid[3][7] = 'A'
+        grid[5][1] = 'A'
+        table = lazor_project_final.TransitionTable(len(grid), len(grid[0]), holelist)
+        self.assertEqual(lazor_project_final.Lazor(grid, lazorlist, holelist, table).lazor_path(),
+                         lazor_project_final.Lazor(grid, lazorlist, holelist).lazor_path())
+        self.assertTrue(lazor_project_final.Lazor(grid, lazorlist, holelist, table).lazor_path(solve=True))
+        grid[5][1] = 'o'
+        self.assertFalse(lazor_project_final.Lazor(grid, lazorlist, holelist, table).lazor_path(solve=True))
+
+    def test_table_crystal(self):
+        '''
+        This function can test a 'D' block met by a lazor moved by a TransitionTable
+        '''
+        grid = [['o'] * 5 for i in range(5)]
+        grid[1][1] = 'D'
+        table = lazor_project_final.TransitionTable(5, 5, [[4, 3]])
+        self.assertEqual(lazor_project_final.Lazor(grid, [[0, 1, 1, 1]], [[4, 3]], table).lazor_path(),
+                         lazor_project_final.Lazor(grid, [[0, 1, 1, 1]], [[4, 3]]).lazor_path())
+        self.assertEqual(lazor_project_final.Lazor(grid, [[0, 1, 1, 1]], [[4, 3]], table).lazor_path(solve=True),
+                         lazor_project_final.Lazor(grid, [[0, 1, 1, 1]], [[4, 3]]).lazor_path(solve=True))
+
+    def test_nogood(self):
+        '''
+        This function can test the failed boards remembered by their touched cells
+        '''
+        grid = [['o', 'o'], ['o', 'o']]
+        nogoods = lazor_project_final.NogoodStore([(0, 0), (1, 0), (0, 1), (1, 1)])
+        nogoods.add(grid, [(0, 0), (1, 1), (5, 5)])
+        grid[1][0] = 'A'
+        self.assertTrue(nogoods.match(grid))
+        grid[1][1] = 'A'
+        self.assertFalse(nogoods.match(grid))
+
+    def test_hole_filter(self):
+        '''
+        This function can test that a board closing in any of the holes is ruled out
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        cells = list(lazor_project_final.hole_flanks(holelist[1]))
+        holes = lazor_project_final.HoleFilter(grid, cells, holelist, lazorlist)
+        self.assertTrue(lazor_project_final.obvs_judge(grid, None, None, holelist))
+        self.assertFalse(holes.seals(holes.mask(['A', 'o'])))
+        for cx, cy in cells:
+            grid[cy][cx] = 'B'
+        self.assertFalse(lazor_project_final.obvs_judge(grid, None, None, holelist))
+        self.assertTrue(holes.seals(holes.mask(['A', 'B'])))
+
+    def test_hole_flank_start(self):
+        '''
+        This function can test a hole kept open by a lazor starting on a side
+        of a cell next to it, which turns on an 'A' block and goes through
+        the cell
+        '''
+        smallgrid = [['o', 'B', 'x', 'o'], ['A', 'B', 'x', 'o'], ['o', 'o', 'x', 'o']]
+        grid = [['x'] * 9 for i in range(7)]
+        for y in range(3):
+            for x in range(4):
+                grid[2 * y + 1][2 * x + 1] = smallgrid[y][x]
+        lazorlist = [[3, 4, -1, 1], [6, 5, 1, -1]]
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        self.assertEqual(lazor_project_final.sealed_flanks([[3, 2]], lazorlist, 7, 9), [])
+        found = lazor_project_final.find_path(grid, 2, 1, 0, lazorlist, [[3, 2]], position)
+        self.assertEqual(found[1], ['B', 'o', 'o', 'A', 'A', 'o'])
+
+    def test_unsolvable(self):
+        '''
+        This function can test that levels no blocks can solve are found before searching
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        lazor_project_final.check_solvable(grid, a, b, c, lazorlist, holelist)
+        with self.assertRaises(lazor_project_final.UnsolvableLevel):
+            lazor_project_final.find_path(grid, 0, 0, 0, lazorlist, holelist, position)
+        with self.assertRaises(lazor_project_final.UnsolvableLevel):
+            lazor_project_final.check_solvable(grid, 20, 0, 0, lazorlist, holelist)
+
+    def test_parking(self):
+        '''
+        This function can test that blocks left over are parked in cells no lazor meets
+        '''
+        self.assertEqual(lazor_project_final.gen_parkings([2, 0, 1], 1, 5),
+                         [(0, 0, 1), (1, 0, 0), (0, 0, 0)])
+        self.assertEqual(lazor_project_final.gen_parkings([2, 0, 1], 1, 2),
+                         [(0, 0, 1), (1, 0, 0)])
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'tiny_5.bff')
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        touched = lazor_project_final.find_reachable(grid, a, b, c, lazorlist, holelist)[1]
+        solution, blocks, board = lazor_project_final.find_path(
+            grid, a, b, c, lazorlist, holelist, position)
+        self.assertEqual(sorted(blocks), sorted(['A'] * a + ['B'] * b + ['C'] * c +
+                                                ['o'] * (len(blocks) - a - b - c)))
+        dead = [(x, y) for x, y in lazor_project_final.Grid(grid).open_cells(position)
+                if (x, y) not in touched]
+        self.assertEqual(len(dead), 1)
+        self.assertNotEqual(board[dead[0][1]][dead[0][0]], 'o')
+
+    def test_surplus(self):
+        '''
+        This function can test that the blocks left over are put where no lazor goes
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        solution, blocks, board = lazor_project_final.find_path(
+            grid, 7, 0, 1, lazorlist, holelist, position, order='surplus')
+        self.assertEqual(blocks.count('A'), 7)
+        self.assertEqual(blocks.count('C'), 1)
+        self.assertTrue(lazor_project_final.Lazor(board, lazorlist, holelist).lazor_path(solve=True))
+        with self.assertRaises(ValueError):
+            lazor_project_final.find_path(grid, 7, 0, 1, lazorlist, holelist, position,
+                                          order='combinations')
+
+    def test_backjump(self):
+        '''
+        This function can test the search with backjumping and the bounded nogood store
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'dark_1.bff')
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        plain = lazor_project_final.PathSearch(grid, a, b, c, lazorlist, holelist, position)
+        jump = lazor_project_final.PathSearch(grid, a, b, c, lazorlist, holelist, position,
+                                              backjump=True)
+        board = jump.solve()[2]
+        self.assertIsNotNone(plain.solve())
+        self.assertTrue(lazor_project_final.Lazor(board, lazorlist, holelist).lazor_path(solve=True))
+        self.assertLess(jump.nodes, plain.nodes)
+        nogoods = lazor_project_final.NogoodStore([(0, 0), (1, 0)], capacity=1)
+        grid = [['A', 'B']]
+        nogoods.add(grid, [(0, 0)])
+        nogoods.add(grid, [(1, 0)])
+        self.assertEqual(len(nogoods.entries), 1)
+        self.assertFalse(nogoods.match([['A', 'o']]))
+        self.assertTrue(nogoods.match([['o', 'B']]))
+
+    def test_transposition(self):
+        '''
+        This function can test that positions reached again are not searched again
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        plain = lazor_project_final.PathSearch(grid, a, b, c, lazorlist, holelist, position)
+        search = lazor_project_final.PathSearch(grid, a, b, c, lazorlist, holelist, position,
+                                                transpositions=1000)
+        self.assertEqual(search.solve()[1], plain.solve()[1])
+        self.assertGreater(search.transpositions.hits, 0)
+        self.assertLess(search.nodes, plain.nodes)
+        stats = {}
+        lazor_project_final.solver('mad_1.bff', method='guided', transpositions=1000, stats=stats)
+        self.assertEqual(stats, {'nodes': search.nodes, 'hits': search.transpositions.hits,
+                                 'misses': search.transpositions.misses})
+        with self.assertRaises(ValueError):
+            lazor_project_final.solver('mad_1.bff', transpositions=1000)
+        table = lazor_project_final.TranspositionTable(1)
+        table.add('a')
+        table.add('b')
+        self.assertFalse(table.seen('a'))
+        self.assertTrue(table.seen('b'))
+        self.assertEqual((table.hits, table.misses), (1, 1))
+
+    def test_groups(self):
+        '''
+        This function can test solving the lazors that never meet on their own
+        '''
+        smallgrid = [['o', 'x', 'o', 'x'], ['B', 'o', 'x', 'x']]
+        grid = [['x'] * 9 for i in range(5)]
+        for row in range(2):
+            for column in range(4):
+                grid[row * 2 + 1][column * 2 + 1] = smallgrid[row][column]
+        lazorlist = [[6, 3, -1, 1], [3, 0, 1, 1]]
+        holelist = [[5, 4], [1, 0]]
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        groups = lazor_project_final.find_groups(grid, 2, 0, 0, lazorlist, holelist)
+        self.assertEqual([group[:2] for group in groups],
+                         [([[6, 3, -1, 1]], [[5, 4]]), ([[3, 0, 1, 1]], [[1, 0]])])
+        solution, blocks, board = lazor_project_final.find_path(
+            grid, 2, 0, 0, lazorlist, holelist, position)
+        self.assertEqual(sorted(blocks), ['A', 'A', 'o'])
+        self.assertTrue(lazor_project_final.Lazor(board, lazorlist, holelist).lazor_path(solve=True))
+
+    def test_constraints(self):
+        '''
+        This function can test finding the blocks the cells on the only ways
+        to the holes must hold
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'dark_1.bff')
+        rules = lazor_project_final.find_constraints(grid, a, b, c, lazorlist, holelist)
+        self.assertEqual(rules, {(1, 3): ['o'], (5, 1): ['o'], (5, 3): ['o']})
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        for order in ['lex', 'combination']:
+            solution, blocks, board = lazor_project_final.find_path(
+                [row.copy() for row in grid], a, b, c, lazorlist, holelist, position,
+                order=order)
+            for (x, y), allowed in rules.items():
+                self.assertIn(board[y][x], allowed)
+
+    def test_line_index(self):
+        '''
+        This function can test looking up what a lazor meets along a line
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'tiny_5.bff')
+        index = lazor_project_final.LineIndex(grid, holelist)
+        holes, stops, block = index.ray(4, 5, -1, -1)
+        self.assertEqual((holes, [stop[2] for stop in stops], block),
+                         ([(1, 2)], [(3, 5), (3, 3), (1, 3), (1, 1)], None))
+        self.assertEqual(index.ray(4, 3, -1, -1),
+                         ([], [(4, 3, (3, 3), 'o')], (3, 2, (3, 1), 'B')))
+        self.assertEqual(index.next_stop(3, 4, -1, -1), (3, 4, (3, 3), 'o'))
+        self.assertEqual(index.holes_between(3, 4, -1, -1, None), [(1, 2)])
+
+    def test_jump(self):
+        '''
+        This function can test the lazor jumping from block to block
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        lines = lazor_project_final.LineIndex(grid, holelist)
+        lazor = lazor_project_final.Lazor(grid, lazorlist, holelist, lines=lines)
+        self.assertFalse(lazor.lazor_path(solve=True))
+        for x, y, block in [(5, 1, 'C'), (7, 3, 'A'), (1, 5, 'B')]:
+            grid[y][x] = block
+            lines.place((x, y), block)
+        grid[5][1] = 'A'
+        lines.remove((1, 5))
+        lines.place((1, 5), 'A')
+        self.assertEqual(lines.next_block(2, 5, -1, 1), (2, 5, (1, 5), 'A'))
+        self.assertTrue(lazor.lazor_path(solve=True))
+        self.assertTrue(lazor_project_final.Lazor(grid, lazorlist, holelist).lazor_path(solve=True))
+        grid = lazor_project_final.read_bff('mad_1.bff')[0]
+        solution, blocks, board = lazor_project_final.find_path(
+            grid, a, b, c, lazorlist, holelist,
+            lazor_project_final.find_fixed_block(smallgrid), order='jump')
+        self.assertTrue(lazor_project_final.Lazor(board, lazorlist, holelist).lazor_path(solve=True))
+
+    def test_trace_core(self):
+        '''
+        This function can test tracing the lazors without making lists
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        table = lazor_project_final.TransitionTable(len(grid), len(grid[0]), holelist)
+        core = lazor_project_final.TraceCore(table, grid, lazorlist)
+        self.assertEqual(core.trace(), 0)
+        for x, y, block in [(5, 1, 'C'), (7, 3, 'A'), (1, 5, 'A')]:
+            core.place(x, y, block)
+        self.assertEqual(core.trace(), 0b1111)
+        self.assertIn((5, 1), core.cells())
+        results = lazor_project_final.benchmark_trace('mad_1.bff', 100)
+        self.assertLess(results['core'][1], results['lazor'][1])
+
+    def test_undo(self):
+        '''
+        This function can test the blocks put into a Grid being taken back out
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'tiny_5.bff')
+        saved = [row.copy() for row in grid]
+        board = lazor_project_final.Grid(grid)
+        cells = board.open_cells(lazor_project_final.find_fixed_block(smallgrid))
+        mark = board.apply(cells[:2], ['A', 'C'])
+        board.apply(cells[2:3], ['B'])
+        self.assertEqual([grid[y][x] for x, y in cells[:3]], ['A', 'C', 'B'])
+        board.revert(mark)
+        self.assertEqual(grid, saved)
+
+    def test_grid_unchanged(self):
+        '''
+        This function can test that the grid given to find_path is not changed
+        by a search that fails or one that finds the answer
+        '''
+        smallgrid = [['A', 'A'], ['o', 'o'], ['x', 'o']]
+        grid = [['x'] * 5 for i in range(7)]
+        for y in range(3):
+            for x in range(2):
+                grid[2 * y + 1][2 * x + 1] = smallgrid[y][x]
+        saved = [row.copy() for row in grid]
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        for order in ['lex', 'combination']:
+            self.assertIsNone(lazor_project_final.find_path(
+                grid, 2, 0, 1, [[2, 5, 1, 1], [4, 5, -1, -1]], [[2, 3]], position,
+                order=order))
+            self.assertEqual(grid, saved)
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        saved = [row.copy() for row in grid]
+        position = lazor_project_final.find_fixed_block(smallgrid)
+        for order in ['lex', 'combination']:
+            board = lazor_project_final.find_path(grid, a, b, c, lazorlist, holelist, position,
+                                                  order=order)[2]
+            self.assertEqual(grid, saved)
+            self.assertNotEqual(board, saved)
+
+    @unittest.skipIf(lazor_project_final.np is None, 'numpy is not installed')
+    def test_batch(self):
+        '''
+        This function can test tracing boards in batches
+        '''
+        grid, a, b, c, lazorlist, holelist, smallgrid = lazor_project_final.read_bff(
+            'mad_1.bff')
+        empty = lazor_project_final.encode_grid(grid)
+        grid[1][5] = 'C'
+        grid[3][7] = 'A'
+        grid[5][1] = 'A'
+        boards = lazor_project_final.np.stack([empty, lazor_project_final.encode_grid(grid)])
+        solved, paths = lazor_project_final.batch_trace(boards, lazorlist, holelist)
+        self.assertEqual(list(solved), [False, True])
+        self.assertEqual(paths, {1: lazor_project_final.Lazor(
+            grid, lazorlist, holelist).lazor_path()})
+
 
 if __name__ == '__main__':
     unittest.main()